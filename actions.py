@@ -0,0 +1,155 @@
+"""Legal actions of a unit, worked out on integer bitboards of the map.
+
+    mask = state.actions.targets(unit, "grenade")  # Every tile it may throw at
+    for kind, (q, r) in state.actions.legal_actions(unit):
+        ...
+
+Bit i of every board stands for the i-th tile of tile_map. The UI menu,
+GameState's actions, the AI and balance.py all ask this module which
+actions are legal, so the rules live in one place:
+
+- "move": any tile in reach (GameState.reachable()) that is free.
+- "attack": an opposing unit within the unit's range, for 2 AP.
+- "HE", "APHE": a tank main gun round at any opposing unit, for 2 AP and
+  one round of that kind. The gun resolves every shot as point blank.
+- "grenade": any tile next to the unit, for 2 AP and a grenade.
+- "smoke": the unit's own tile or one next to it, for 2 AP and a smoke grenade.
+
+A unit that has been destroyed or has surrendered has no legal actions.
+"""
+from game_objects import TankUnit
+from hexgrid import spiral
+from pathfinding import passable
+
+ACTION_KINDS = ("move", "attack", "HE", "APHE", "grenade", "smoke")
+
+def bits(mask):
+    # Indices of the set bits, lowest first
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class ActionGenerator:
+    """Occupancy, faction and passability bitboards of one battle.
+
+    GameState keeps the boards current through add(), moved() and
+    remove(); terrain, and so passability, is fixed for the battle. Smoke
+    does not restrict any action, so it has no board. Disks of each radius
+    around each hex are built on first use and kept. Move masks are kept
+    per (tile, AP) until the path finder's occupancy version changes.
+    """
+    def __init__(self, state):
+        self.state = state
+        self.coords = list(state.tile_map)
+        self.bit = {coord: i for i, coord in enumerate(self.coords)}
+        self.occupied = 0
+        self.factions = {False: 0, True: 0}
+        self.passable = 0
+        for i, tile in enumerate(state.tile_map.values()):
+            if passable(tile):
+                self.passable |= 1 << i
+        self.disks = {}  # (tile bit, radius) -> mask of tiles within radius
+        self.move_masks = {}  # (tile bit, AP) -> mask of tiles in reach
+        self.move_version = None
+
+    # --- Bookkeeping ---
+    def add(self, unit):
+        mask = 1 << self.bit[(unit.q, unit.r)]
+        self.occupied |= mask
+        self.factions[unit.is_enemy] |= mask
+
+    def moved(self, unit, old):
+        mask = 1 << self.bit[old] | 1 << self.bit[(unit.q, unit.r)]
+        self.occupied ^= mask
+        self.factions[unit.is_enemy] ^= mask
+
+    def remove(self, unit, coord):
+        mask = ~(1 << self.bit[coord])
+        self.occupied &= mask
+        self.factions[unit.is_enemy] &= mask
+
+    # --- Masks ---
+    def disk(self, coord, radius):
+        """Mask of the tiles within radius of coord, coord included."""
+        key = (self.bit[coord], radius)
+        mask = self.disks.get(key)
+        if mask is None:
+            mask = 0
+            for near in spiral(coord[0], coord[1], radius):
+                i = self.bit.get(near)
+                if i is not None:
+                    mask |= 1 << i
+            self.disks[key] = mask
+        return mask
+
+    def move_mask(self, unit):
+        paths = self.state.paths
+        if self.move_version != paths.version:
+            self.move_masks.clear()
+            self.move_version = paths.version
+        key = (self.bit[(unit.q, unit.r)], unit.agility_points)
+        mask = self.move_masks.get(key)
+        if mask is None:
+            mask = 0
+            for coord in self.state.reachable(unit):
+                mask |= 1 << self.bit[coord]
+            self.move_masks[key] = mask
+        return mask & self.passable & ~self.occupied
+
+    def targets(self, unit, kind):
+        """Mask of the tiles unit may take one action of this kind on, right now."""
+        if not self.state.on_map(unit):
+            return 0  # Destroyed or surrendered; its q and r are where it fell
+        here = (unit.q, unit.r)
+        if kind == "move":
+            if unit.agility_points <= 0:
+                return 0
+            return self.move_mask(unit)
+        if unit.agility_points < 2:
+            return 0
+        if kind == "attack":
+            return self.disk(here, unit.range) & self.factions[not unit.is_enemy]
+        if kind in ("HE", "APHE"):
+            if not isinstance(unit, TankUnit):
+                return 0
+            if (unit.he_rounds if kind == "HE" else unit.aphe_rounds) <= 0:
+                return 0
+            return self.factions[not unit.is_enemy]
+        if kind == "grenade":
+            if unit.grenades <= 0:
+                return 0
+            return self.disk(here, 1) & ~(1 << self.bit[here])
+        if kind == "smoke":
+            if unit.smoke_grenades <= 0:
+                return 0
+            return self.disk(here, 1)
+        raise ValueError(f"Unknown action kind: {kind}")
+
+    # --- Queries ---
+    def legal(self, unit, kind, q, r):
+        i = self.bit.get((q, r))
+        return i is not None and (self.targets(unit, kind) >> i) & 1 == 1
+
+    def kinds(self, unit):
+        # The kinds of action unit has at least one target for, in ACTION_KINDS order
+        return [kind for kind in ACTION_KINDS if self.targets(unit, kind)]
+
+    def legal_actions(self, unit):
+        """Every legal (kind, (q, r)) of the unit, by kind and then tile order."""
+        coords = self.coords
+        return [(kind, coords[i]) for kind in ACTION_KINDS for i in bits(self.targets(unit, kind))]
+
+    def tiles(self, mask):
+        return [self.coords[i] for i in bits(mask)]
+
+    def units(self, mask):
+        tile_map = self.state.tile_map
+        return [tile_map[self.coords[i]].unit for i in bits(mask & self.occupied)]
+
+    def attack_targets(self, unit, coord=None, radius=None):
+        # Opposing units within radius (the unit's range) of coord (where it
+        # stands), in tile order, whatever AP it has left
+        coord = (unit.q, unit.r) if coord is None else coord
+        radius = unit.range if radius is None else radius
+        return self.units(self.disk(coord, radius) & self.factions[not unit.is_enemy])
@@ -0,0 +1,116 @@
+"""The enemy turn, worked out in a separate process while the UI keeps drawing.
+
+    turn = AiTurn(game)  # After game.end_turn(play_ai=False)
+    action = turn.step()  # Each frame: apply the next streamed action, if one is ready
+
+The UI pickles a snapshot of the GameState to a worker running this file
+as a script. The worker plays the enemy turn on the snapshot and streams
+each action back as it is taken (see GameState.apply_ai_action()). The
+live state then replays them in order, so the worker's thinking never
+blocks a frame. The worker is a plain subprocess rather than a
+multiprocessing one because spawning through multiprocessing re-runs the
+parent's main script, and main.py is the game itself.
+"""
+import os
+import pickle
+import queue
+import subprocess
+import sys
+import threading
+
+AI_TURN_TIME_CAP_MS = 5000  # The worker is stopped after this long; actions it already sent still play
+WORKER_PATH = os.path.abspath(__file__)
+
+class AiTurn:
+    """One enemy turn computed by a worker process and applied to the live state action by action.
+
+    A reader thread sends the snapshot and collects the worker's messages
+    in a queue; step() hands them to the state on the caller's thread.
+    A timer kills the worker time_cap_ms after it starts, however slowly
+    the caller steps, and the turn ends with the actions it managed to
+    send. cancel() stops the worker and drops whatever has not been
+    applied yet. Either way the state stays consistent, since actions
+    are applied whole and in order. A worker that fails is logged to the
+    state once its last action has been applied.
+    """
+    def __init__(self, state, time_cap_ms=AI_TURN_TIME_CAP_MS):
+        self.state = state
+        self.messages = queue.Queue()
+        self.finished = False
+        self.timed_out = False
+        self.error = None  # What broke the stream, if the worker's output could not be read
+        self.applied = 0
+        snapshot = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+        self.process = subprocess.Popen([sys.executable, WORKER_PATH], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.timer = None
+        if time_cap_ms is not None:
+            self.timer = threading.Timer(time_cap_ms / 1000, self.time_up)
+            self.timer.daemon = True
+            self.timer.start()
+        self.reader = threading.Thread(target=self.read, args=(snapshot,), name="AiTurnReader", daemon=True)
+        self.reader.start()
+
+    def time_up(self):
+        self.timed_out = True
+        self.process.kill()
+
+    def read(self, snapshot):
+        try:
+            self.process.stdin.write(snapshot)
+            self.process.stdin.close()
+            while True:
+                self.messages.put(pickle.load(self.process.stdout))
+        except EOFError:
+            pass
+        except (OSError, pickle.UnpicklingError) as e:
+            self.error = e
+            self.process.kill()
+        self.process.wait()
+        if self.timer is not None:
+            self.timer.cancel()
+        self.messages.put(None)  # The worker is done or gone
+
+    def step(self):
+        """Apply the next action the worker sent and return it, or None if none is ready yet."""
+        if self.finished:
+            return None
+        try:
+            message = self.messages.get_nowait()
+        except queue.Empty:
+            return None
+        if message is None:
+            self.finished = True
+            if self.timed_out:
+                self.state.log("The enemy ran out of time and ends its turn.")
+            elif self.error is not None or self.process.returncode:
+                reason = self.error or f"exit code {self.process.returncode}"
+                self.state.log(f"The enemy AI failed ({reason}) and ends its turn.")
+            return None
+        if message[0] == "done":
+            # The AI as the worker left it, transposition table and all
+            self.state.ai = message[1]
+            return None
+        self.state.apply_ai_action(message)
+        self.applied += 1
+        return message
+
+    def cancel(self):
+        self.finished = True
+        if self.timer is not None:
+            self.timer.cancel()
+        self.process.kill()
+
+def main():
+    state = pickle.load(sys.stdin.buffer)
+    out = sys.stdout.buffer
+
+    def send(message):
+        pickle.dump(message, out, pickle.HIGHEST_PROTOCOL)
+        out.flush()
+
+    state.on_ai_action = send
+    state.ai_turn()
+    send(("done", state.ai))
+
+if __name__ == "__main__":
+    main()
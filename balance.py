@@ -0,0 +1,160 @@
+"""Monte Carlo balancing: play many scripted battles per mission and summarise the outcomes.
+
+    python balance.py --battles 2000
+    python balance.py --missions 0 2 --battles 500 --workers 4 --seed 7
+    python balance.py --ai search --search-playouts 200 --battles 200
+"""
+import argparse
+import multiprocessing
+import statistics
+import time
+from collections import Counter
+
+from game_objects import InfantryUnit
+from game_state import GameState, MISSIONS
+from hexgrid import hex_distance
+from search import SearchAI
+
+MAX_TURNS = 30  # A battle still undecided after this many rounds is a draw
+SEARCH_PLAYOUTS = 200  # Playouts per search AI decision; no time budget, so runs replay exactly
+
+# === PLAYER POLICIES ===
+def nearest(unit, targets):
+    return min(targets, key=lambda target: hex_distance(unit.q, unit.r, target.q, target.r))
+
+def shoot_until_empty(game, unit):
+    # Fire at the nearest enemy in range while AP lasts; True if anything was in range
+    fired = False
+    while unit.agility_points >= 2 and game.on_map(unit):
+        in_range = game.actions.attack_targets(unit)
+        if not in_range:
+            break
+        target = nearest(unit, in_range)
+        if not game.attack(unit, target.q, target.r):
+            break
+        fired = True
+    return fired
+
+def advance_policy(game):
+    # Close on the nearest enemy and shoot as soon as it is in range
+    for unit in game.active_units(False):
+        while game.on_map(unit):
+            if shoot_until_empty(game, unit):
+                break
+            enemies = game.active_units(True)
+            if not enemies or not game.advance(unit, nearest(unit, enemies)):
+                break
+
+def hold_policy(game):
+    # Stay put and only shoot what walks into range
+    for unit in game.active_units(False):
+        shoot_until_empty(game, unit)
+
+PLAYER_POLICIES = {
+    "advance": advance_policy,
+    "hold": hold_policy,
+}
+
+# === BATTLES ===
+def side_report(units):
+    lost = [unit for unit in units if unit.health <= 0 or unit.surrendered]
+    soldiers_lost = sum(unit.base_soldiers - unit.soldiers for unit in units if isinstance(unit, InfantryUnit))
+    morale = [unit.morale for unit in units if unit not in lost]
+    return len(lost), soldiers_lost, morale
+
+def run_battle(job):
+    """Play one battle and return its outcome as a plain dict (cheap to send between processes)."""
+    mission_id, seed, policy, max_turns, ai, playouts = job
+    game = GameState.from_mission(mission_id, seed)
+    if ai == "search":
+        game.ai = SearchAI(seed, unit_budget_ms=None, turn_budget_ms=None, max_playouts=playouts)
+    play = PLAYER_POLICIES[policy]
+    turns = 0
+    while turns < max_turns and game.winner() is None:
+        turns += 1
+        play(game)
+        game.end_turn()  # Enemy turn
+        game.end_turn()  # Back to the player
+        game.pop_messages()
+        game.pop_changed_tiles()
+
+    player_lost, player_soldiers_lost, player_morale = side_report(game.units)
+    enemy_lost, enemy_soldiers_lost, enemy_morale = side_report(game.enemy_units)
+    return {
+        "mission": mission_id,
+        "winner": game.winner() or "draw",
+        "turns": turns,
+        "player_lost": player_lost,
+        "player_soldiers_lost": player_soldiers_lost,
+        "player_morale": player_morale,
+        "enemy_lost": enemy_lost,
+        "enemy_soldiers_lost": enemy_soldiers_lost,
+        "enemy_morale": enemy_morale,
+    }
+
+def battle_jobs(missions, battles, seed, policy, max_turns, ai, playouts):
+    # Each battle gets its own seed string, so results do not depend on
+    # which worker plays it or in what order
+    for mission_id in missions:
+        for i in range(battles):
+            yield mission_id, f"{seed}:{mission_id}:{i}", policy, max_turns, ai, playouts
+
+def run_battles(missions, battles, seed=0, policy="advance", max_turns=MAX_TURNS, workers=None,
+                ai="greedy", playouts=SEARCH_PLAYOUTS):
+    jobs = list(battle_jobs(missions, battles, seed, policy, max_turns, ai, playouts))
+    if workers == 1:
+        return [run_battle(job) for job in jobs]
+    workers = workers or multiprocessing.cpu_count()
+    # Big chunks keep the pool's per-task overhead small next to a ~1 ms battle
+    chunksize = max(1, len(jobs) // (workers * 8))
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(run_battle, jobs, chunksize)
+
+# === REPORT ===
+def describe(values):
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    p90 = values[min(len(values) - 1, int(len(values) * 0.9))]
+    return (f"mean {statistics.fmean(values):.2f}  median {statistics.median(values):g}  "
+            f"p90 {p90:g}  min {values[0]:g}  max {values[-1]:g}")
+
+def histogram(values):
+    return "  ".join(f"{value}:{count}" for value, count in sorted(Counter(values).items()))
+
+def print_report(results):
+    for mission_id in sorted({result["mission"] for result in results}):
+        rows = [result for result in results if result["mission"] == mission_id]
+        winners = Counter(row["winner"] for row in rows)
+        print(f"\nMission {mission_id}: {MISSIONS[mission_id]['name']} ({len(rows)} battles)")
+        print("  Win rate       " + "  ".join(
+            f"{side} {winners[side] / len(rows):.1%}" for side in ("player", "enemy", "draw")))
+        for side in ("player", "enemy"):
+            turns = [row["turns"] for row in rows if row["winner"] == side]
+            print(f"  Turns to {side + ' win':<11}" + describe(turns))
+        for side in ("player", "enemy"):
+            print(f"  {side.capitalize()} units lost  " + histogram(row[f"{side}_lost"] for row in rows))
+            print(f"  {side.capitalize()} soldiers lost  " + describe([row[f"{side}_soldiers_lost"] for row in rows]))
+            print(f"  {side.capitalize()} final morale  " + describe([m for row in rows for m in row[f"{side}_morale"]]))
+
+def main():
+    parser = argparse.ArgumentParser(description="Play scripted battles for every mission and report balance statistics.")
+    parser.add_argument("--battles", type=int, default=1000, help="battles per mission")
+    parser.add_argument("--missions", type=int, nargs="+", default=sorted(MISSIONS), help="mission ids to play")
+    parser.add_argument("--policy", choices=sorted(PLAYER_POLICIES), default="advance", help="scripted player behaviour")
+    parser.add_argument("--ai", choices=["greedy", "search"], default="greedy", help="enemy behaviour")
+    parser.add_argument("--search-playouts", type=int, default=SEARCH_PLAYOUTS, help="playouts per search AI decision")
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS, help="rounds before a battle counts as a draw")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="base seed; the same seed replays the same battles")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_battles(args.missions, args.battles, args.seed, args.policy, args.max_turns, args.workers,
+                          args.ai, args.search_playouts)
+    elapsed = time.perf_counter() - start
+    print(f"{len(results)} battles in {elapsed:.2f}s ({len(results) / elapsed:.0f} battles/s)")
+    print_report(results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Frame cost of draw_map() as the map grows, headless.
+
+    python bench_draw_map.py
+    python bench_draw_map.py --radii 8 40 80 --frames 200 --pan-frames 600
+
+Runs main.py's definitions (everything above its main loop) on SDL's
+dummy video driver, fills maps of each radius with random terrain and a
+unit on about one tile in ten, and times draw_map() with the camera
+over the middle of the map. The first frame, which renders the terrain
+chunks in view, is left out. With culling, the time per frame should
+stay flat as the radius grows.
+
+The pan case then drags the camera across the largest map at the largest
+zoom and back, building chunks as they scroll in, and reports the time
+per frame and the most terrain chunks (and megabytes) held at once. With
+the chunk cache bounded, that peak does not grow with the map.
+"""
+import argparse
+import math
+import os
+import random
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from game_objects import Tile, TERRAIN_TYPES
+from game_state import GameState, make_infantry, map_coords
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+UNIT_SHARE = 0.1  # Share of tiles holding a unit
+
+def load_ui():
+    # main.py runs the game at import, so only execute what precedes the main loop
+    with open(MAIN_PATH) as f:
+        source = f.read().split("# === MAIN LOOP ===")[0]
+    ui = {"__name__": "bench_ui", "__file__": MAIN_PATH}
+    exec(compile(source, MAIN_PATH, "exec"), ui)
+    if ui.get("video_bg"):
+        ui["video_bg"].stop()
+    return ui
+
+def make_battle(radius, seed):
+    rng = random.Random(seed)
+    tile_map = {(q, r): Tile(q, r, rng.choice(TERRAIN_TYPES)) for q, r in map_coords(radius)}
+    game = GameState(tile_map, seed)
+    for coord in tile_map:
+        if rng.random() < UNIT_SHARE:
+            game.add_unit(make_infantry("Russian", rng.random() < 0.5), *coord)
+    return game
+
+def time_draw_map(ui, game, frames):
+    ui["game"] = game
+    ui["selected_unit"] = None
+    ui["camera_offset_x"] = ui["screen_width"] // 2
+    ui["camera_offset_y"] = ui["screen_height"] // 2
+    ui["draw_map"]()  # Renders the terrain chunks in view
+    start = time.perf_counter()
+    for _ in range(frames):
+        ui["draw_map"]()
+    return (time.perf_counter() - start) / frames * 1000
+
+def time_pan(ui, game, frames, size):
+    # Sweep the camera from the map's left edge to its right and back along the middle row
+    ui["game"] = game
+    ui["selected_unit"] = None
+    ui["hex_size"] = size
+    radius = max(q for q, r in game.tile_map)
+    extent = size * math.sqrt(3) * radius
+    layer = ui["terrain_layer"]
+    peak = 0
+    start = time.perf_counter()
+    for frame in range(frames):
+        phase = frame / max(1, frames - 1)
+        x = extent * (1 - 4 * phase if phase < 0.5 else 4 * phase - 3)
+        ui["camera_offset_x"] = ui["screen_width"] // 2 + int(x)
+        ui["camera_offset_y"] = ui["screen_height"] // 2
+        ui["draw_map"]()
+        peak = max(peak, len(layer.chunks))
+    ms = (time.perf_counter() - start) / frames * 1000
+    chunk = next(iter(layer.chunks.values()))
+    chunk_mb = chunk.get_width() * chunk.get_height() * chunk.get_bytesize() / 2**20
+    return ms, peak, peak * chunk_mb
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--radii", type=int, nargs="+", default=[8, 20, 40, 80])
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pan-frames", type=int, default=400)
+    args = parser.parse_args()
+
+    ui = load_ui()
+    print(f"{'radius':>6} {'tiles':>7} {'ms/frame':>9}")
+    for radius in args.radii:
+        game = make_battle(radius, args.seed)
+        ms = time_draw_map(ui, game, args.frames)
+        print(f"{radius:>6} {len(game.tile_map):>7} {ms:>9.2f}")
+
+    radius, size = max(args.radii), ui["max_hex_size"]
+    ms, chunks, mb = time_pan(ui, make_battle(radius, args.seed), args.pan_frames, size)
+    print(f"pan across radius {radius} at hex size {size}: {ms:.2f} ms/frame, "
+          f"at most {chunks} terrain chunks held ({mb:.0f} MB)")
+
+if __name__ == "__main__":
+    main()
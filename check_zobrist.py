@@ -0,0 +1,80 @@
+"""Check the incremental Zobrist hash against recompute(), here and in a fresh process.
+
+    python check_zobrist.py
+    python check_zobrist.py --battles 20 --turns 15 --seed 3
+
+Plays seeded battles (scripted player against the greedy AI, and the
+search AI on alternate battles), comparing zobrist.hash with a full
+recompute() after every turn. Each checkpoint's state is also pickled to
+one fresh Python process, which must recompute the same hash: that is
+what ai_worker.py and balance.py rely on when they move states between
+processes. Exits with status 1 on the first mismatch.
+"""
+import argparse
+import pickle
+import subprocess
+import sys
+
+from balance import advance_policy
+from game_state import GameState, MISSIONS
+from search import SearchAI
+
+# Run by the fresh process: read pickled states until EOF, print each recomputed hash
+RECOMPUTE = """
+import pickle, sys
+while True:
+    try:
+        state = pickle.load(sys.stdin.buffer)
+    except EOFError:
+        break
+    print(state.zobrist.recompute(state))
+"""
+
+def checkpoints(battles, turns, seed):
+    """Yield (label, state, hash) at the start and after every half turn of each battle."""
+    for battle in range(battles):
+        mission_id = battle % len(MISSIONS)
+        game = GameState.from_mission(mission_id, seed + battle)
+        if battle % 2:
+            game.ai = SearchAI(seed + battle, unit_budget_ms=None, turn_budget_ms=None, max_playouts=50)
+        yield f"battle {battle} start", pickle.dumps(game), game.zobrist.hash, game
+        for turn in range(turns):
+            if game.winner() is not None:
+                break
+            advance_policy(game)
+            game.end_turn()
+            yield f"battle {battle} turn {turn} enemy", pickle.dumps(game), game.zobrist.hash, game
+            game.end_turn()
+            yield f"battle {battle} turn {turn} player", pickle.dumps(game), game.zobrist.hash, game
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--battles", type=int, default=6)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    labels, snapshots, expected = [], [], []
+    for label, snapshot, value, game in checkpoints(args.battles, args.turns, args.seed):
+        if game.zobrist.recompute(game) != value:
+            print(f"FAIL {label}: incremental hash differs from recompute()")
+            return 1
+        labels.append(label)
+        snapshots.append(snapshot)
+        expected.append(value)
+
+    fresh = subprocess.run([sys.executable, "-c", RECOMPUTE], input=b"".join(snapshots),
+                           capture_output=True, check=True)
+    recomputed = [int(line) for line in fresh.stdout.split()]
+    for label, value, other in zip(labels, expected, recomputed):
+        if value != other:
+            print(f"FAIL {label}: a fresh process recomputes a different hash")
+            return 1
+    if len(recomputed) != len(expected):
+        print(f"FAIL: the fresh process returned {len(recomputed)} hashes for {len(expected)} states")
+        return 1
+    print(f"OK: {len(expected)} checkpoints match, in this process and in a fresh one")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
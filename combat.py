@@ -0,0 +1,347 @@
+"""Shot resolution and combat log text, shared by the game and headless simulations."""
+import math
+import random
+
+import numpy as np
+
+from game_objects import InfantryUnit, TankUnit
+
+# Terrain modifiers to hit chance
+TERRAIN_HIT_MODIFIERS = {
+    "House": 0.8,    # Units in houses are harder to hit (was 0.7)
+    "Hill": 0.85,    # Units on hills are harder to hit (was 0.8)
+    "Forest": 0.8,   # Units in forests are harder to hit (was 0.75)
+    "Bridge": 1.3,   # Units on bridges are easier to hit
+    "Plains": 1.0,   # Normal hit chance on plains
+    "Road": 1.0,     # Normal hit chance on roads
+    "River": 0.0,    # Can't hit units in river (they can't be there anyway)
+}
+
+# Terrain effects on the damage of a hit
+TERRAIN_DAMAGE_MODIFIERS = {
+    "House": 0.7,
+    "Hill": 0.9,
+}
+
+ENEMY_SHOT_DISTANCE = 1  # The enemy AI resolves every shot as point blank, whatever the range
+
+def calculate_damage(attacker, defender, tile, ammo_type=None, distance=1, rng=random):
+    # Base damage calculation
+    damage = attacker.base_damage
+    
+    # Calculate base hit chance based on unit stats
+    base_hit_chance = attacker.accuracy * 1.2  # Increase base accuracy by 20%
+    
+    # Apply terrain modifier to hit chance
+    hit_chance = base_hit_chance * TERRAIN_HIT_MODIFIERS.get(tile.terrain_type, 1.0)
+    
+    # Apply morale modifier to hit chance (higher morale = better accuracy)
+    morale_modifier = 0.6 + (attacker.morale / 200)  # 0.6 to 1.6 range (was 0.5 to 1.5)
+    hit_chance *= morale_modifier
+    
+    # Apply range penalty (reduced penalty)
+    if distance > 1:
+        hit_chance *= (1 - (distance - 1) * 0.15)  # 15% penalty per hex of distance (was 20%)
+    
+    # Apply smoke effects (reduced penalty)
+    if defender.smoke_affected:
+        hit_chance *= 0.6  # 40% penalty (was 50%)
+    
+    # Roll for hit
+    hit_roll = rng.randint(1, 100)
+    if hit_roll > hit_chance:
+        return 0  # Miss
+    
+    # If hit, calculate damage
+    damage = attacker.base_damage
+    
+    # Apply terrain effects to damage
+    if tile.terrain_type in TERRAIN_DAMAGE_MODIFIERS:
+        damage *= TERRAIN_DAMAGE_MODIFIERS[tile.terrain_type]
+    
+    # Initialize armor reduction
+    armor_reduction = 0
+    
+    # Apply ammunition type effects
+    if isinstance(attacker, TankUnit):
+        if ammo_type == "HE":
+            if isinstance(defender, InfantryUnit):
+                damage *= 1.5
+            else:
+                damage *= 0.8
+            armor_reduction = max(0, defender.armor - attacker.armor_penetration)
+        elif ammo_type == "APHE":
+            if isinstance(defender, TankUnit):
+                damage *= 1.3
+                armor_reduction = max(0, defender.armor - attacker.armor_penetration * 1.5)
+            else:
+                damage *= 0.7
+                armor_reduction = max(0, defender.armor - attacker.armor_penetration)
+        else:
+            armor_reduction = max(0, defender.armor - attacker.armor_penetration)
+    else:
+        armor_reduction = max(0, defender.armor - attacker.armor_penetration)
+    
+    # Apply armor reduction
+    damage *= (1 - (armor_reduction / 100))
+    
+    # Apply range damage reduction for infantry (reduced penalty)
+    if isinstance(attacker, InfantryUnit):
+        if distance == 2:
+            damage *= 0.85  # 15% reduction (was 20%)
+        elif distance == 3:
+            damage *= 0.7   # 30% reduction (was 40%)
+    
+    # Reduce defender's morale based on damage taken
+    morale_loss = int(damage / 5)  # 1 morale loss per 5 damage
+    defender.morale = max(0, defender.morale - morale_loss)
+    
+    return int(damage)
+
+# === BATCHED RESOLUTION ===
+# calculate_damage() for whole arrays of shots at once. Units, terrain and
+# ammo are turned into small integer codes and the per-shot branches into
+# table lookups and masks, applied in the same order as the scalar path, so
+# a shot that hits deals exactly the damage calculate_damage() would give it.
+# The engine and SearchAI still roll shot by shot: their shots depend on
+# the ones before and draw from a random.Random. This is for tools that
+# roll many independent shots.
+KIND_INFANTRY, KIND_TANK, KIND_OTHER = 0, 1, 2
+AMMO_NONE, AMMO_HE, AMMO_APHE = 0, 1, 2
+AMMO_CODES = {None: AMMO_NONE, "HE": AMMO_HE, "APHE": AMMO_APHE}
+
+# Every terrain the hit or damage tables know about, plus a last slot for any other
+TERRAIN_IDS = {name: i for i, name in enumerate(TERRAIN_HIT_MODIFIERS)}
+TERRAIN_OTHER = len(TERRAIN_IDS)
+HIT_MODIFIER_TABLE = np.array(list(TERRAIN_HIT_MODIFIERS.values()) + [1.0])
+DAMAGE_MODIFIER_TABLE = np.array([TERRAIN_DAMAGE_MODIFIERS.get(name, 1.0) for name in TERRAIN_IDS] + [1.0])
+
+def unit_kind(unit):
+    if isinstance(unit, TankUnit):
+        return KIND_TANK
+    if isinstance(unit, InfantryUnit):
+        return KIND_INFANTRY
+    return KIND_OTHER
+
+# Column name and dtype of a shot batch, in shot_batch()'s row order
+SHOT_COLUMNS = (
+    ("base_damage", np.float64), ("accuracy", np.float64), ("morale", np.float64),
+    ("attacker_kind", np.int64), ("armor_penetration", np.float64),
+    ("armor", np.float64), ("defender_kind", np.int64), ("smoke", np.bool_),
+    ("terrain", np.int64), ("distance", np.int64), ("ammo", np.int64),
+)
+
+def shot_batch(shots):
+    """Pack (attacker, defender, tile, ammo_type, distance) tuples into the arrays resolve_shots() takes.
+
+    No shots give zero-length arrays under the same names.
+    """
+    rows = [(attacker.base_damage, attacker.accuracy, attacker.morale, unit_kind(attacker), attacker.armor_penetration,
+             defender.armor, unit_kind(defender), defender.smoke_affected,
+             TERRAIN_IDS.get(tile.terrain_type, TERRAIN_OTHER), distance, AMMO_CODES[ammo_type])
+            for attacker, defender, tile, ammo_type, distance in shots]
+    return {name: np.array([row[i] for row in rows], dtype=dtype)
+            for i, (name, dtype) in enumerate(SHOT_COLUMNS)}
+
+def hit_chances(batch):
+    # Hit chance in percent for every shot, as in calculate_damage()
+    hit_chance = batch["accuracy"] * 1.2 * HIT_MODIFIER_TABLE[batch["terrain"]]
+    hit_chance = hit_chance * (0.6 + batch["morale"] / 200)
+    hit_chance = hit_chance * np.where(batch["distance"] > 1, 1 - (batch["distance"] - 1) * 0.15, 1.0)
+    return hit_chance * np.where(batch["smoke"], 0.6, 1.0)
+
+def hit_damages(batch):
+    # Damage every shot would deal if it hits, before truncation to int
+    attacker_tank = batch["attacker_kind"] == KIND_TANK
+    defender_tank = batch["defender_kind"] == KIND_TANK
+    he = attacker_tank & (batch["ammo"] == AMMO_HE)
+    aphe = attacker_tank & (batch["ammo"] == AMMO_APHE)
+
+    damage = batch["base_damage"] * DAMAGE_MODIFIER_TABLE[batch["terrain"]]
+    ammo_modifier = np.ones(damage.shape)
+    ammo_modifier[he] = np.where(batch["defender_kind"][he] == KIND_INFANTRY, 1.5, 0.8)
+    ammo_modifier[aphe] = np.where(defender_tank[aphe], 1.3, 0.7)
+    damage = damage * ammo_modifier
+
+    penetration = np.where(aphe & defender_tank, batch["armor_penetration"] * 1.5, batch["armor_penetration"])
+    armor_reduction = np.maximum(0, batch["armor"] - penetration)
+    damage = damage * (1 - (armor_reduction / 100))
+
+    infantry = batch["attacker_kind"] == KIND_INFANTRY
+    range_modifier = np.ones(damage.shape)
+    range_modifier[infantry & (batch["distance"] == 2)] = 0.85
+    range_modifier[infantry & (batch["distance"] == 3)] = 0.7
+    return damage * range_modifier
+
+def resolve_shots(batch, rng):
+    """Roll every shot in a batch with a NumPy Generator.
+
+    Returns (hits, damage): a boolean mask and the integer damage of each
+    shot, 0 on a miss. Unlike calculate_damage() nothing is mutated; the
+    defender's morale loss is damage // 5.
+    """
+    rolls = rng.integers(1, 101, size=len(batch["distance"]))
+    hits = rolls <= hit_chances(batch)
+    damage = np.where(hits, hit_damages(batch), 0.0).astype(np.int64)
+    return hits, damage
+
+# === EXPECTED OUTCOMES ===
+# calculate_damage() without the dice. The roll is uniform on 1..100 and
+# a shot hits when roll <= hit chance, so P(hit) = floor(hit chance) / 100
+# and a hit always deals the same damage. The per-shot branches are
+# compiled into the tables below once, and each factor is applied in the
+# scalar path's order so probabilities and damage match it exactly.
+MAX_TABLE_DISTANCE = 8
+TERRAIN_HIT_TABLE = HIT_MODIFIER_TABLE.tolist()
+TERRAIN_DAMAGE_TABLE = DAMAGE_MODIFIER_TABLE.tolist()
+RANGE_HIT_TABLE = [1.0, 1.0] + [1 - (distance - 1) * 0.15 for distance in range(2, MAX_TABLE_DISTANCE + 1)]
+# [attacker kind][distance]
+RANGE_DAMAGE_TABLE = [
+    [{2: 0.85, 3: 0.7}.get(distance, 1.0) if kind == KIND_INFANTRY else 1.0
+     for distance in range(MAX_TABLE_DISTANCE + 1)]
+    for kind in (KIND_INFANTRY, KIND_TANK, KIND_OTHER)
+]
+
+def ammo_factors(attacker_kind, defender_kind, ammo):
+    # (damage multiplier, armor penetration multiplier)
+    if attacker_kind != KIND_TANK or ammo == AMMO_NONE:
+        return 1.0, 1.0
+    if ammo == AMMO_HE:
+        return (1.5 if defender_kind == KIND_INFANTRY else 0.8), 1.0
+    if defender_kind == KIND_TANK:
+        return 1.3, 1.5
+    return 0.7, 1.0
+
+# [attacker kind][defender kind][ammo]
+AMMO_TABLE = [[[ammo_factors(a, d, ammo) for ammo in (AMMO_NONE, AMMO_HE, AMMO_APHE)]
+               for d in (KIND_INFANTRY, KIND_TANK, KIND_OTHER)]
+              for a in (KIND_INFANTRY, KIND_TANK, KIND_OTHER)]
+
+def shot_odds(attacker, defender, tile, ammo_type=None, distance=1):
+    """Return (hit probability, damage on a hit) for one shot, without rolling."""
+    attacker_kind = unit_kind(attacker)
+    terrain = TERRAIN_IDS.get(tile.terrain_type, TERRAIN_OTHER)
+    if distance <= MAX_TABLE_DISTANCE:
+        range_hit = RANGE_HIT_TABLE[distance]
+        range_damage = RANGE_DAMAGE_TABLE[attacker_kind][distance]
+    else:
+        range_hit = 1 - (distance - 1) * 0.15
+        range_damage = 1.0
+
+    hit_chance = attacker.accuracy * 1.2 * TERRAIN_HIT_TABLE[terrain]
+    hit_chance *= 0.6 + (attacker.morale / 200)
+    hit_chance *= range_hit
+    if defender.smoke_affected:
+        hit_chance *= 0.6
+    hit_probability = min(100, max(0, math.floor(hit_chance))) / 100
+
+    ammo_damage, penetration = AMMO_TABLE[attacker_kind][unit_kind(defender)][AMMO_CODES[ammo_type]]
+    damage = attacker.base_damage * TERRAIN_DAMAGE_TABLE[terrain] * ammo_damage
+    damage *= 1 - (max(0, defender.armor - attacker.armor_penetration * penetration) / 100)
+    damage *= range_damage
+    return hit_probability, int(damage)
+
+def expected_damage(attacker, defender, tile, ammo_type=None, distance=1):
+    hit_probability, damage = shot_odds(attacker, defender, tile, ammo_type, distance)
+    return hit_probability * damage
+
+def outcome_distribution(attacker, defender, tile, ammo_type=None, distance=1):
+    """Every way a shot can leave the defender, as dicts with a "probability".
+
+    Each outcome gives the defender's soldiers, health and morale afterwards
+    and a "status" of "active", "destroyed" or "surrendered", as the engine
+    would resolve it through calculate_damage() and take_damage().
+    """
+    hit_probability, damage = shot_odds(attacker, defender, tile, ammo_type, distance)
+    untouched = {"soldiers": defender.soldiers, "health": defender.health,
+                 "morale": defender.morale, "status": "active"}
+    outcomes = []
+    if hit_probability < 1:
+        outcomes.append(dict(untouched, probability=1 - hit_probability))
+    if hit_probability == 0:
+        return outcomes
+
+    hit = dict(untouched, morale=max(0, defender.morale - damage // 5), probability=hit_probability)
+    if damage <= 0:
+        outcomes.append(hit)
+    elif isinstance(defender, InfantryUnit):
+        soldiers = max(0, defender.soldiers - int(damage / 10))
+        hit.update(soldiers=soldiers, health=soldiers * 10)
+        if soldiers > 0:
+            outcomes.append(hit)
+        else:
+            # take_damage() flips a coin between surrender and destruction
+            outcomes.append(dict(hit, status="surrendered", probability=hit_probability / 2))
+            outcomes.append(dict(hit, status="destroyed", probability=hit_probability / 2))
+    else:
+        health = max(0, defender.health - damage)
+        hit.update(health=health, status="active" if health > 0 else "destroyed")
+        outcomes.append(hit)
+    return outcomes
+
+def get_combat_message(attacker, defender, damage, distance, ammo_type=None):
+    messages = []
+    
+    # Get terrain type for the defender
+    defender_terrain = defender.tile_map[(defender.q, defender.r)].terrain_type
+    
+    # Create initial attack message with distance and terrain
+    distance_text = "point blank" if distance == 1 else f"{distance} hexes away"
+    terrain_text = f"on {defender_terrain.lower()}" if defender_terrain != "Plains" else "in the open"
+    
+    if isinstance(attacker, TankUnit):
+        if ammo_type == "HE":
+            messages.append(f"{attacker.name} fires a High Explosive round at {defender.name} {distance_text} {terrain_text}!")
+        elif ammo_type == "APHE":
+            messages.append(f"{attacker.name} fires an Armor Piercing round at {defender.name} {distance_text} {terrain_text}!")
+        else:
+            messages.append(f"{attacker.name} engages {defender.name} {distance_text} {terrain_text}!")
+    else:
+        messages.append(f"{attacker.name} opens fire on {defender.name} {distance_text} {terrain_text}!")
+    
+    # Damage and result messages
+    if damage > 0:
+        if isinstance(defender, TankUnit):
+            soldier_loss = max(1, int(damage / 10))
+            if damage > defender.health * 0.5:
+                messages.append(f"Critical hit! The round penetrates the armor, causing severe damage! The tank takes {damage} damage!")
+            elif damage > defender.health * 0.2:
+                messages.append(f"The round strikes the tank, causing moderate damage! The tank takes {damage} damage!")
+            else:
+                messages.append(f"The round glances off the armor, causing minor damage! The tank takes {damage} damage!")
+        else:
+            soldier_loss = max(1, int(damage / 10))
+            if soldier_loss > defender.soldiers * 0.5:
+                messages.append(f"Devastating fire! {soldier_loss} soldiers fall! The unit takes {damage} damage!")
+            elif soldier_loss > defender.soldiers * 0.2:
+                messages.append(f"Heavy casualties! {soldier_loss} soldiers are hit! The unit takes {damage} damage!")
+            else:
+                messages.append(f"{soldier_loss} soldiers are wounded! The unit takes {damage} damage!")
+        
+        # Add morale effect message
+        if defender.morale < 30:
+            messages.append(f"The unit's morale is critically low at {defender.morale}%!")
+        elif defender.morale < 50:
+            messages.append(f"The unit's morale is wavering at {defender.morale}%!")
+    else:
+        if isinstance(attacker, TankUnit):
+            messages.append(f"The round misses its target, exploding harmlessly in the distance!")
+        else:
+            messages.append(f"The shots go wide, failing to find their mark!")
+    
+    # Add terrain effect message if relevant
+    if damage > 0:
+        if defender_terrain == "House":
+            messages.append("The building provides some cover from the attack!")
+        elif defender_terrain == "Hill":
+            messages.append("The elevated position helps mitigate the damage!")
+        elif defender_terrain == "Bridge":
+            messages.append("The exposed position on the bridge makes the unit more vulnerable!")
+        elif defender_terrain == "Forest":
+            messages.append("The dense forest provides some protection from the attack!")
+    
+    # Add smoke effect message if applicable
+    if defender.smoke_affected:
+        messages.append("The smoke screen helps protect the unit from the attack!")
+    
+    return messages
@@ -1,7 +1,7 @@
-import pygame
-import math
 import random
 
+from hexgrid import hex_distance, neighbors
+
 TERRAIN_TYPES = ["Plains", "Hill", "Forest", "House", "Road"]
 TERRAIN_COLORS = {
     "Plains": (100, 200, 100),  # Light green
@@ -11,11 +11,37 @@ TERRAIN_COLORS = {
     "Road": (200, 200, 150)     # Light brown/beige
 }
 
-def get_neighbors(q, r):
-    directions = [(+1, 0), (+1, -1), (0, -1), (-1, 0), (-1, +1), (0, +1)]
-    return [(q + dq, r + dr) for dq, dr in directions]
+class HashedField:
+    """A unit or tile field that is part of the battle's Zobrist hash (see zobrist.py).
+
+    Writes, from anywhere, report the old and new value to the hash. It
+    defines no __get__, so reads are plain instance attribute lookups; a
+    field read before it is first assigned would return the descriptor,
+    so declare each one on the class whose __init__ sets it.
+    """
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __set__(self, obj, value):
+        fields = obj.__dict__
+        zobrist = fields.get("zobrist")
+        if zobrist is not None:
+            zobrist.changed(fields["zobrist_slot"], self.name, fields.get(self.name), value)
+        fields[self.name] = value
 
 class Unit:
+    q = HashedField()
+    r = HashedField()
+    health = HashedField()
+    soldiers = HashedField()
+    agility_points = HashedField()
+    morale = HashedField()
+    accuracy = HashedField()
+    surrendered = HashedField()
+    smoke_affected = HashedField()
+    grenades = HashedField()
+    smoke_grenades = HashedField()
+
     def __init__(self, name, base_health, base_damage, base_morale, base_agility, base_soldiers, image_key, range_, is_enemy=False):
         self.name = name
         self.base_health = base_health
@@ -40,9 +66,13 @@ class Unit:
         self.r = None
         self.surrendered = False
         self.tile_map = None  # Reference to the tile map
+        self.unit_index = None  # Optional UnitIndex of the units on that map
+        self.zobrist = None  # Hash of the battle this unit is in, and its slot there
+        self.zobrist_slot = None
 
-    def set_tile_map(self, tile_map):
+    def set_tile_map(self, tile_map, unit_index=None):
         self.tile_map = tile_map
+        self.unit_index = unit_index
 
     def reset_turn(self):
         self.agility_points = self.base_agility
@@ -60,14 +90,18 @@ class Unit:
         # Count nearby friendly and enemy units
         nearby_friendly = 0
         nearby_enemy = 0
-        for nq, nr in get_neighbors(self.q, self.r):
-            if (nq, nr) in self.tile_map:
-                unit = self.tile_map[(nq, nr)].unit
-                if unit:
-                    if unit.is_enemy == self.is_enemy:
-                        nearby_friendly += 1
-                    else:
-                        nearby_enemy += 1
+        if self.unit_index is not None:
+            nearby_friendly = len(self.unit_index.neighbors(self.q, self.r, self.is_enemy))
+            nearby_enemy = len(self.unit_index.neighbors(self.q, self.r, not self.is_enemy))
+        else:
+            for nq, nr in neighbors(self.q, self.r):
+                if (nq, nr) in self.tile_map:
+                    unit = self.tile_map[(nq, nr)].unit
+                    if unit:
+                        if unit.is_enemy == self.is_enemy:
+                            nearby_friendly += 1
+                        else:
+                            nearby_enemy += 1
         
         # Calculate morale modifiers
         health_modifier = health_percentage / 100
@@ -84,13 +118,13 @@ class Unit:
             return True
         return False
 
-    def take_damage(self, damage):
+    def take_damage(self, damage, rng=random):
         if isinstance(self, InfantryUnit):
             self.soldiers = max(0, self.soldiers - int(damage / 10))
             self.health = self.soldiers * 10
             if self.health <= 0:
                 # 50-50 chance of death or surrender
-                if random.random() < 0.5:
+                if rng.random() < 0.5:
                     self.surrendered = True
                     return True
                 else:
@@ -102,10 +136,7 @@ class Unit:
         return False
 
     def is_adjacent(self, other_tile):
-        dq = abs(self.q - other_tile.q)
-        dr = abs(self.r - other_tile.r)
-        ds = abs(-self.q - self.r + other_tile.q + other_tile.r)
-        return max(dq, dr, ds) == 1
+        return hex_distance(self.q, self.r, other_tile.q, other_tile.r) == 1
 
     def can_throw_grenade(self, target_tile):
         # Check if unit has grenades and enough AP
@@ -185,6 +216,9 @@ class InfantryUnit(Unit):
             return self.accuracy * 0.6  # 40% penalty at long range
 
 class TankUnit(Unit):
+    he_rounds = HashedField()
+    aphe_rounds = HashedField()
+
     def __init__(self, name, base_health, base_damage, base_morale, base_agility, base_soldiers, image_key, range_, armor, armor_penetration, is_enemy=False):
         super().__init__(name, base_health, base_damage, base_morale, base_agility, base_soldiers, image_key, range_, is_enemy)
         self.armor = armor
@@ -210,11 +244,16 @@ class TankUnit(Unit):
         return base_report
 
 class Tile:
+    smoke = HashedField()
+    smoke_turns = HashedField()
+
     def __init__(self, q, r, terrain_type):
         self.q = q
         self.r = r
         self.terrain_type = terrain_type
         self.unit = None
+        self.zobrist = None  # Hash of the battle this tile is in, and its slot there
+        self.zobrist_slot = (q, r)
         self.smoke = False
         self.smoke_turns = 0  # Track how many turns the smoke will last
 
@@ -0,0 +1,549 @@
+"""Battle state and rules with no pygame dependency, so battles can be simulated headless."""
+import math
+import random
+
+from game_objects import InfantryUnit, TankUnit, Tile, TERRAIN_TYPES
+from hexgrid import hex_distance, neighbors
+from pathfinding import PathFinder, passable
+from actions import ActionGenerator
+from influence import InfluenceMap
+from zobrist import Zobrist
+from combat import ENEMY_SHOT_DISTANCE, calculate_damage, expected_damage, get_combat_message
+
+MAP_RADIUS = 8
+INDEX_BUCKET_SIZE = 4  # Side in hexes of each spatial hash bucket
+
+# === MISSION DATA ===
+MISSIONS = {
+    0: {
+        "name": "Operation Case Blue - Mission 1",
+        "date": "June 28, 1942",
+        "description": "Initial assault on the Soviet positions. Secure the forward positions and establish a foothold.",
+        "player_pos": (0, 0),
+        "tank_pos": (1, 0)
+    },
+    1: {
+        "name": "Operation Case Blue - Mission 2",
+        "date": "July 1, 1942",
+        "description": "Advance through enemy territory. Capture key strategic positions and eliminate enemy resistance.",
+        "player_pos": (-2, 2),
+        "tank_pos": (-1, 2)
+    },
+    2: {
+        "name": "Soviet Counteroffensive - Mission 1",
+        "date": "July 15, 1942",
+        "description": "Lead the Soviet counterattack through the dense forests. Eliminate German positions and secure the area.",
+        "player_pos": (0, 0),
+        "tank_pos": (1, 0),
+        "is_russian": True,
+        "additional_units": [
+            {"type": "infantry", "pos": (-1, 1)},
+            {"type": "tank", "pos": (1, -1)}
+        ],
+        "enemy_units": [
+            {"type": "infantry", "pos": (3, 3)},
+            {"type": "infantry", "pos": (4, 2)},
+            {"type": "tank", "pos": (3, 2)}
+        ]
+    }
+}
+
+def map_coords(radius=MAP_RADIUS):
+    for q in range(-radius, radius + 1):
+        for r in range(-radius, radius + 1):
+            if -q - r >= -radius and -q - r <= radius:
+                yield q, r
+
+def mission_terrain(mission_id, q, r):
+    if mission_id == 0:  # City-based mission with river
+        # Create a river (horizontal line)
+        if r == 0:
+            return "River"
+        # Create bridges across the river
+        elif r == 0 and (q == -2 or q == 2):
+            return "Bridge"
+        # Create a city center
+        elif abs(q) <= 2 and abs(r) <= 2 and r != 0:
+            return "House"
+        # Create some roads
+        elif q == 0 or r == 0 or q == r or q == -r:
+            return "Road"
+        # Rest is plains
+        return "Plains"
+    elif mission_id == 1:  # Hill-based mission
+        # Create a central hill formation
+        if abs(q) <= 3 and abs(r) <= 3:
+            return "Hill"
+        # Create some forest patches
+        elif (abs(q) == 4 and abs(r) <= 2) or (abs(r) == 4 and abs(q) <= 2):
+            return "Forest"
+        # Rest is plains
+        return "Plains"
+    else:  # Forest-based Russian mission
+        # Create some clearings
+        if abs(q) <= 1 and abs(r) <= 1:
+            return "Plains"
+        # Create some hills
+        elif (abs(q) == 3 and abs(r) <= 2) or (abs(r) == 3 and abs(q) <= 2):
+            return "Hill"
+        # Rest is forest
+        return "Forest"
+
+class UnitIndex:
+    """Units on the map by faction, hashed into square buckets of axial coordinates.
+
+    Faction is the unit's is_enemy flag. Dicts stand in for sets so that
+    iteration follows insertion order and seeded battles replay exactly.
+    """
+    def __init__(self, bucket_size=INDEX_BUCKET_SIZE):
+        self.bucket_size = bucket_size
+        self.factions = {False: {}, True: {}}
+        self.buckets = {False: {}, True: {}}
+
+    def bucket(self, q, r):
+        return q // self.bucket_size, r // self.bucket_size
+
+    def add(self, unit):
+        self.factions[unit.is_enemy][unit] = None
+        self.buckets[unit.is_enemy].setdefault(self.bucket(unit.q, unit.r), {})[unit] = None
+
+    def remove(self, unit):
+        if unit not in self.factions[unit.is_enemy]:
+            return
+        del self.factions[unit.is_enemy][unit]
+        buckets = self.buckets[unit.is_enemy]
+        key = self.bucket(unit.q, unit.r)
+        del buckets[key][unit]
+        if not buckets[key]:
+            del buckets[key]
+
+    def move(self, unit, q, r):
+        # Updates the unit's own coordinates too, so the two never disagree
+        old_key, new_key = self.bucket(unit.q, unit.r), self.bucket(q, r)
+        unit.q, unit.r = q, r
+        if old_key == new_key or unit not in self.factions[unit.is_enemy]:
+            return
+        buckets = self.buckets[unit.is_enemy]
+        del buckets[old_key][unit]
+        if not buckets[old_key]:
+            del buckets[old_key]
+        buckets.setdefault(new_key, {})[unit] = None
+
+    def __contains__(self, unit):
+        return unit in self.factions[unit.is_enemy]
+
+    def units(self, is_enemy):
+        return list(self.factions[is_enemy])
+
+    def in_range(self, q, r, radius, is_enemy):
+        """Units of one faction within radius hexes of (q, r)."""
+        buckets = self.buckets[is_enemy]
+        lo_q, hi_q = (q - radius) // self.bucket_size, (q + radius) // self.bucket_size
+        lo_r, hi_r = (r - radius) // self.bucket_size, (r + radius) // self.bucket_size
+        if (hi_q - lo_q + 1) * (hi_r - lo_r + 1) > len(buckets):
+            # Wider than the occupied area: walk the buckets we have instead
+            candidates = (unit for key, bucket in buckets.items()
+                          if lo_q <= key[0] <= hi_q and lo_r <= key[1] <= hi_r for unit in bucket)
+        else:
+            candidates = (unit for bq in range(lo_q, hi_q + 1) for br in range(lo_r, hi_r + 1)
+                          for unit in buckets.get((bq, br), ()))
+        return [unit for unit in candidates if hex_distance(q, r, unit.q, unit.r) <= radius]
+
+    def neighbors(self, q, r, is_enemy):
+        # Units of one faction on the six tiles around (q, r)
+        return [unit for unit in self.in_range(q, r, 1, is_enemy) if (unit.q, unit.r) != (q, r)]
+
+def make_infantry(side, is_enemy):
+    morale = 60 if is_enemy else 70
+    agility = 4 if is_enemy else 5
+    key = "rus_infantry" if side == "Russian" else "ger_infantry"
+    return InfantryUnit(f"{side} Infantry", 100, 20, morale, agility, 10, key, range_=1, is_enemy=is_enemy)
+
+def make_tank(side, is_enemy):
+    key = "rus_tank" if side == "Russian" else "ger_tank"
+    return TankUnit(f"{side} Tank", 200, 40, 80, 3, 5, key, range_=2, armor=50, armor_penetration=30, is_enemy=is_enemy)
+
+class GameState:
+    """One battle: the map, both sides' units, whose turn it is and the random stream.
+
+    Every action takes units and coordinates, applies the rules and returns
+    whether it happened; which actions are legal is up to `actions` (see
+    actions.py). Log text is queued in `messages` and tiles whose look
+    changed (smoke) in `changed_tiles`, for a UI to pick up; a simulation can
+    ignore both.
+    """
+    def __init__(self, tile_map=None, seed=None):
+        self.rng = random.Random(seed)
+        if tile_map is None:
+            tile_map = {}
+            for q, r in map_coords():
+                tile_map[(q, r)] = Tile(q, r, self.rng.choice(TERRAIN_TYPES))
+        self.tile_map = tile_map
+        self.units = []
+        self.enemy_units = []
+        self.index = UnitIndex()
+        self.paths = PathFinder(tile_map)
+        self.influence = InfluenceMap(tile_map)
+        self.zobrist = Zobrist(tile_map)
+        self.actions = ActionGenerator(self)
+        self.field_goals = None
+        self.field = None
+        self.ai = None  # Enemy controller with play_turn(state); None plays the greedy loop
+        self.on_ai_action = None  # Called with each AI action as it is taken (see apply_ai_action())
+        self.turn_player = True
+        self.messages = []
+        self.changed_tiles = set()
+
+    @classmethod
+    def from_mission(cls, mission_id, seed=None):
+        mission = MISSIONS[mission_id]
+        tile_map = {(q, r): Tile(q, r, mission_terrain(mission_id, q, r)) for q, r in map_coords()}
+        state = cls(tile_map, seed)
+
+        if mission.get("is_russian", False):
+            state.add_unit(make_infantry("Russian", False), *mission["player_pos"])
+            state.add_unit(make_tank("Russian", False), *mission["tank_pos"])
+            for unit_data in mission["additional_units"]:
+                make = make_infantry if unit_data["type"] == "infantry" else make_tank
+                state.add_unit(make("Russian", False), *unit_data["pos"])
+            for unit_data in mission["enemy_units"]:
+                make = make_infantry if unit_data["type"] == "infantry" else make_tank
+                state.add_unit(make("German", True), *unit_data["pos"])
+        else:
+            state.add_unit(make_infantry("German", False), *mission["player_pos"])
+            state.add_unit(make_tank("German", False), *mission["tank_pos"])
+            # The single Russian squad starts on the first free far tile
+            for (q, r), tile in tile_map.items():
+                if tile.unit is None and abs(q) + abs(r) > 8:
+                    state.add_unit(make_infantry("Russian", True), q, r)
+                    break
+        return state
+
+    # --- Bookkeeping ---
+    def log(self, message):
+        self.messages.append(message)
+
+    def pop_messages(self):
+        messages, self.messages = self.messages, []
+        return messages
+
+    def pop_changed_tiles(self):
+        changed, self.changed_tiles = self.changed_tiles, set()
+        return changed
+
+    def add_unit(self, unit, q, r):
+        unit.q, unit.r = q, r
+        unit.set_tile_map(self.tile_map, self.index)
+        self.tile_map[(q, r)].unit = unit
+        self.index.add(unit)
+        self.influence.add(unit)
+        self.paths.tile_blocked((q, r))
+        self.actions.add(unit)
+        self.zobrist.add_unit(unit)
+        (self.enemy_units if unit.is_enemy else self.units).append(unit)
+        return unit
+
+    def take_off_map(self, tile):
+        # The unit on this tile died or surrendered
+        self.index.remove(tile.unit)
+        self.influence.remove(tile.unit)
+        self.actions.remove(tile.unit, (tile.q, tile.r))
+        tile.unit = None
+        self.paths.tile_freed((tile.q, tile.r))
+
+    def relocate(self, unit, q, r):
+        old = (unit.q, unit.r)
+        self.tile_map[old].unit = None
+        self.index.move(unit, q, r)
+        self.influence.unit_moved(unit)
+        self.tile_map[(q, r)].unit = unit
+        self.paths.tile_freed(old)
+        self.paths.tile_blocked((q, r))
+        self.actions.moved(unit, old)
+
+    def advance(self, unit, target):
+        # Walk the cheapest route towards the target until it is in weapon
+        # range or a shot (2 AP) can no longer be afforded; False if no step was taken
+        route = self.paths.find_path((unit.q, unit.r), (target.q, target.r), occupied_goal=True)
+        if route is None:
+            return False
+        moved = False
+        for q, r in route[1][1:-1]:
+            if unit.agility_points < 2 or hex_distance(unit.q, unit.r, target.q, target.r) <= unit.range:
+                break
+            step_cost = self.tile_map[(q, r)].movement_cost
+            if step_cost > unit.agility_points:
+                break
+            self.relocate(unit, q, r)
+            unit.agility_points -= step_cost
+            moved = True
+        return moved
+
+    def flow_step(self, unit, field):
+        # Step onto the free neighbour that is cheapest in the flow field,
+        # if it is closer than where the unit stands; False if no such step is affordable
+        best, best_cost = None, field.get((unit.q, unit.r), math.inf)
+        for coord, tile in self.paths.steps((unit.q, unit.r)):
+            cost = field.get(coord)
+            if cost is not None and cost < best_cost and tile.unit is None and tile.movement_cost <= unit.agility_points:
+                best, best_cost = coord, cost
+        if best is None:
+            return False
+        self.ai_move(unit, best[0], best[1], self.tile_map[best].movement_cost)
+        return True
+
+    def firing_positions(self, unit):
+        # {coord: AP cost} of reachable tiles that leave AP for a shot and
+        # put an opposing unit in range
+        reach = self.paths.reachable((unit.q, unit.r), unit.agility_points - 2)
+        cover = self.influence.covered(not unit.is_enemy, unit.range)
+        position = self.influence.position
+        return {coord: cost for coord, cost in reach.items() if cover[position[coord]]}
+
+    def take_firing_position(self, unit):
+        # Move to the firing position least threatened by the other side
+        spots = self.firing_positions(unit)
+        if not spots:
+            return False
+        q, r = self.influence.safest(list(spots), unit.is_enemy)
+        self.ai_move(unit, q, r, spots[(q, r)])
+        return True
+
+    def approach_field(self):
+        # Flow field towards every player unit, rebuilt only when one of them moves or leaves the map
+        goals = tuple((unit.q, unit.r) for unit in self.index.factions[False])
+        if goals != self.field_goals:
+            self.field_goals = goals
+            self.field = self.paths.flow_field(goals)
+        return self.field
+
+    def reachable(self, unit):
+        # {coord: AP cost} of every tile the unit can move to this turn
+        return self.paths.reachable((unit.q, unit.r), unit.agility_points)
+
+    def state_hash(self):
+        # Zobrist hash of positions, health, AP, ammo, smoke and the side to move
+        return self.zobrist.hash
+
+    def on_map(self, unit):
+        return unit in self.index
+
+    def active_units(self, is_enemy):
+        return self.index.units(is_enemy)
+
+    def winner(self):
+        # "player", "enemy" or None while both sides still have units on the map
+        if not self.active_units(True):
+            return "player"
+        if not self.active_units(False):
+            return "enemy"
+        return None
+
+    def resolve_shot(self, attacker, tile, damage, distance, ammo_type=None):
+        for msg in get_combat_message(attacker, tile.unit, damage, distance, ammo_type):
+            self.log(msg)
+        if damage > 0:
+            self.influence.unit_changed(tile.unit)  # Lost morale
+            if tile.unit.take_damage(damage, self.rng):
+                self.log(f"{tile.unit.name} has been destroyed!")
+                self.take_off_map(tile)
+            elif tile.unit.surrendered:
+                self.log(f"{tile.unit.name} surrenders!")
+                self.take_off_map(tile)
+
+    # --- Actions ---
+    def move(self, unit, q, r):
+        # Walk the cheapest route there, paying each tile's movement cost in AP
+        tile = self.tile_map.get((q, r))
+        if tile is None or tile.unit is not None or not self.on_map(unit):
+            return False
+        if not passable(tile):
+            self.log("Cannot move into river!")
+            return False
+        if unit.agility_points <= 0:
+            self.log("Not enough action points!")
+            return False
+        if not self.actions.legal(unit, "move", q, r):
+            self.log("Cannot move that far!")
+            return False
+
+        cost = self.reachable(unit)[(q, r)]
+        self.relocate(unit, q, r)
+        unit.agility_points -= cost
+        return True
+
+    def attack(self, unit, q, r):
+        if not self.actions.legal(unit, "attack", q, r):
+            return False
+        # Range is for shooting only
+        tile = self.tile_map[(q, r)]
+        dist = hex_distance(unit.q, unit.r, q, r)
+        unit.agility_points -= 2
+        damage = calculate_damage(unit, tile.unit, tile, distance=dist, rng=self.rng)
+        self.resolve_shot(unit, tile, damage, dist)
+        return True
+
+    def fire(self, unit, q, r, ammo_type):
+        # Tank main gun, ammo_type "HE" or "APHE"
+        if not self.actions.legal(unit, ammo_type, q, r):
+            return False
+        tile = self.tile_map[(q, r)]
+        if ammo_type == "HE":
+            unit.he_rounds -= 1
+        else:
+            unit.aphe_rounds -= 1
+        unit.agility_points -= 2
+
+        damage = calculate_damage(unit, tile.unit, tile, ammo_type, rng=self.rng)
+        self.resolve_shot(unit, tile, damage, 1, ammo_type)
+        return True
+
+    def throw_grenade(self, unit, q, r):
+        if not self.actions.legal(unit, "grenade", q, r):
+            self.log(f"{unit.name} cannot throw a grenade there!")
+            return False
+        tile = self.tile_map[(q, r)]
+        target = tile.unit
+        unit.throw_grenade(tile)
+        if target and tile.unit is None:
+            # Unit.throw_grenade() clears the tile of a unit it kills
+            self.index.remove(target)
+            self.influence.remove(target)
+            self.actions.remove(target, (q, r))
+            self.paths.tile_freed((q, r))
+        return True
+
+    def throw_smoke(self, unit, q, r):
+        if not self.actions.legal(unit, "smoke", q, r):
+            return False
+        tile = self.tile_map[(q, r)]
+
+        # Apply smoke effect to target tile and adjacent tiles
+        affected_tiles = [self.tile_map[n] for n in neighbors(q, r) if n in self.tile_map]
+        affected_tiles.append(tile)
+        for smoked in affected_tiles:
+            smoked.smoke = True
+            smoked.smoke_turns = 2  # Smoke lasts for 2 turns
+            self.changed_tiles.add((smoked.q, smoked.r))
+            if smoked.unit:
+                smoked.unit.smoke_affected = True
+
+        # Create message about affected units
+        affected_units = [smoked.unit.name for smoked in affected_tiles if smoked.unit]
+        if affected_units:
+            self.log(f"{unit.name} throws a smoke grenade! The smoke screen conceals {', '.join(affected_units)}!")
+        else:
+            self.log(f"{unit.name} throws a smoke grenade, creating a smoke screen!")
+
+        unit.smoke_grenades -= 1
+        unit.agility_points -= 2
+        return True
+
+    def end_turn(self, play_ai=True):
+        # Ending the player's turn runs the enemy, unless play_ai is False
+        # and the caller plays it some other way; ending the enemy's turn
+        # readies the player's units and thins the smoke.
+        self.turn_player = not self.turn_player
+        self.zobrist.flip_side()
+        if self.turn_player:
+            for unit in self.units:
+                unit.agility_points = unit.base_agility
+                unit.accuracy = unit.base_accuracy
+                unit.smoke_affected = False
+            self.influence.invalidate()
+            # Update smoke duration
+            for tile in self.tile_map.values():
+                if tile.smoke:
+                    tile.smoke_turns -= 1
+                    if tile.smoke_turns <= 0:
+                        tile.smoke = False
+                        self.changed_tiles.add((tile.q, tile.r))
+                        # Remove smoke_affected status from any unit in this tile
+                        if tile.unit:
+                            tile.unit.smoke_affected = False
+        elif play_ai:
+            self.ai_turn()
+
+    # --- Morale and AI ---
+    def update_morale(self, unit):
+        if unit.health <= 0 or unit.surrendered:
+            return
+
+        # Check for nearby friendly units
+        nearby_friends = sum(1 for neighbor_unit in self.index.neighbors(unit.q, unit.r, False)
+                             if neighbor_unit != unit)
+
+        # Morale boost from nearby friends (up to +5 per turn)
+        if nearby_friends > 0:
+            morale_boost = min(5, nearby_friends)
+            unit.morale = min(100, unit.morale + morale_boost)
+            self.influence.unit_changed(unit)
+            if morale_boost > 0:
+                self.log(f"{unit.name} gains {morale_boost} morale from nearby friendly units!")
+
+    def best_target(self, unit, targets):
+        # The target we expect ai_shoot() to hurt most, first in map order on ties
+        targets = sorted(targets, key=lambda target: (target.q, target.r))
+        return max(targets, key=lambda target: expected_damage(
+            unit, target, self.tile_map[(target.q, target.r)], distance=ENEMY_SHOT_DISTANCE))
+
+    # Every change the AI makes goes through ai_ready(), ai_move() and
+    # ai_shoot(), which report it to on_ai_action. Applied in order with
+    # apply_ai_action() to a copy of the state as it was when the turn
+    # began, the actions replay the turn exactly, dice included, since
+    # the copy's random stream is in the same place.
+    def record(self, action):
+        if self.on_ai_action is not None:
+            self.on_ai_action(action)
+
+    def ai_ready(self, enemy):
+        # Start of the unit's part of the enemy turn
+        self.record(("ready", enemy.zobrist_slot))
+        enemy.agility_points = enemy.base_agility
+        self.update_morale(enemy)
+
+    def ai_move(self, enemy, q, r, cost):
+        self.record(("move", enemy.zobrist_slot, (enemy.q, enemy.r), (q, r), cost))
+        self.relocate(enemy, q, r)
+        enemy.agility_points -= cost
+
+    def apply_ai_action(self, action):
+        kind, slot = action[0], action[1]
+        unit = self.zobrist.units[slot]
+        if kind == "ready":
+            self.ai_ready(unit)
+        elif kind == "move":
+            self.ai_move(unit, *action[3], action[4])
+        elif kind == "shoot":
+            self.ai_shoot(unit, self.zobrist.units[action[2]])
+        else:
+            raise ValueError(f"Unknown AI action: {kind}")
+
+    def ai_shoot(self, enemy, target):
+        self.record(("shoot", enemy.zobrist_slot, target.zobrist_slot))
+        tile = self.tile_map[(target.q, target.r)]
+        dist = hex_distance(enemy.q, enemy.r, target.q, target.r)
+        # Deduct AP before calculating damage
+        enemy.agility_points -= 2
+        damage = calculate_damage(enemy, target, tile, distance=ENEMY_SHOT_DISTANCE, rng=self.rng)
+        self.resolve_shot(enemy, tile, damage, dist)
+
+    def ai_turn(self):
+        if self.ai is not None:
+            self.ai.play_turn(self)
+            return
+        for enemy in self.enemy_units:
+            if enemy.health <= 0 or enemy.surrendered:
+                continue
+            self.ai_ready(enemy)
+            while enemy.agility_points >= 2:
+                targets = self.actions.attack_targets(enemy)
+                if targets:
+                    self.ai_shoot(enemy, self.best_target(enemy, targets))
+                    continue
+
+                # Take the safest firing position in reach, or else step closer to the player units
+                if self.take_firing_position(enemy):
+                    continue
+                if not self.index.factions[False] or not self.flow_step(enemy, self.approach_field()):
+                    break
@@ -0,0 +1,94 @@
+"""Axial hex grid math shared by the rules, the AI and rendering.
+
+Coordinates are axial (q, r) on a pointy-topped grid, with s = -q - r
+implied. Offsets for every ring and filled range up to MAX_TABLE_RADIUS
+are computed once at import, so range and area queries are table walks.
+"""
+import math
+
+import numpy as np
+
+# Longest weapon range (tanks, 4) with room for movement and area queries
+MAX_TABLE_RADIUS = 8
+
+DIRECTIONS = ((+1, 0), (+1, -1), (0, -1), (-1, 0), (-1, +1), (0, +1))
+
+def hex_distance(q1, r1, q2, r2):
+    dq = q1 - q2
+    dr = r1 - r2
+    return max(abs(dq), abs(dr), abs(dq + dr))
+
+def hex_distances(q, r, qs, rs):
+    """Distances from (q, r) to every hex in the coordinate arrays qs, rs."""
+    dq = np.asarray(qs) - q
+    dr = np.asarray(rs) - r
+    return np.maximum(np.maximum(np.abs(dq), np.abs(dr)), np.abs(dq + dr))
+
+def ring_offsets(radius):
+    if radius == 0:
+        return ((0, 0),)
+    # Start on the ring and walk radius steps along each direction in turn
+    q, r = DIRECTIONS[4][0] * radius, DIRECTIONS[4][1] * radius
+    offsets = []
+    for dq, dr in DIRECTIONS:
+        for _ in range(radius):
+            offsets.append((q, r))
+            q, r = q + dq, r + dr
+    return tuple(offsets)
+
+RING_OFFSETS = tuple(ring_offsets(radius) for radius in range(MAX_TABLE_RADIUS + 1))
+# Everything within each radius, centre first and then ring by ring
+SPIRAL_OFFSETS = tuple(sum(RING_OFFSETS[:radius + 1], ()) for radius in range(MAX_TABLE_RADIUS + 1))
+# The same as (n, 2) arrays for vectorized use
+SPIRAL_OFFSET_ARRAYS = tuple(np.array(offsets) for offsets in SPIRAL_OFFSETS)
+
+_neighbor_cache = {}
+
+def neighbors(q, r):
+    # The six adjacent hexes, built once per hex and shared after that
+    cached = _neighbor_cache.get((q, r))
+    if cached is None:
+        cached = _neighbor_cache[(q, r)] = tuple((q + dq, r + dr) for dq, dr in DIRECTIONS)
+    return cached
+
+def ring(q, r, radius):
+    offsets = RING_OFFSETS[radius] if radius <= MAX_TABLE_RADIUS else ring_offsets(radius)
+    return [(q + dq, r + dr) for dq, dr in offsets]
+
+def spiral(q, r, radius):
+    """Every hex within radius of (q, r), nearest first."""
+    if radius <= MAX_TABLE_RADIUS:
+        offsets = SPIRAL_OFFSETS[radius]
+    else:
+        offsets = sum((ring_offsets(k) for k in range(radius + 1)), ())
+    return [(q + dq, r + dr) for dq, dr in offsets]
+
+def in_range(q, r, radius, tile_map):
+    # Hexes within radius that are on the map, nearest first
+    return [coord for coord in spiral(q, r, radius) if coord in tile_map]
+
+# === PIXELS ===
+def hex_to_pixel(q, r, size):
+    # Pointy topped hex coordinates
+    x = size * math.sqrt(3) * (q + r / 2)
+    y = size * 3/2 * r
+    return x, y
+
+def pixel_to_hex(x, y, size):
+    q = (x * math.sqrt(3)/3 - y / 3) / size
+    r = y * 2/3 / size
+    return hex_round(q, r)
+
+def hex_round(q, r):
+    x = q
+    z = r
+    y = -x - z
+    rx, ry, rz = round(x), round(y), round(z)
+    x_diff, y_diff, z_diff = abs(rx - x), abs(ry - y), abs(rz - z)
+    if x_diff > y_diff and x_diff > z_diff:
+        rx = -ry - rz
+    elif y_diff > z_diff:
+        ry = -rx - rz
+    else:
+        rz = -rx - ry
+    return int(rx), int(rz)
@@ -0,0 +1,177 @@
+"""Per-faction NumPy grids of the expected damage each side can deal to every hex."""
+import numpy as np
+
+from combat import (HIT_MODIFIER_TABLE, DAMAGE_MODIFIER_TABLE, TERRAIN_IDS, TERRAIN_OTHER,
+                    RANGE_HIT_TABLE, RANGE_DAMAGE_TABLE, MAX_TABLE_DISTANCE, ENEMY_SHOT_DISTANCE, unit_kind)
+from hexgrid import MAX_TABLE_RADIUS, SPIRAL_OFFSET_ARRAYS, hex_distances, spiral
+
+def range_offsets(radius):
+    # Offsets within radius, without the centre, and the distance of each
+    if radius <= MAX_TABLE_RADIUS:
+        offsets = SPIRAL_OFFSET_ARRAYS[radius][1:]
+    else:
+        offsets = np.array(spiral(0, 0, radius)[1:])
+    return offsets, hex_distances(0, 0, offsets[:, 0], offsets[:, 1])
+
+class InfluenceMap:
+    """Expected damage per hex from each faction's units, as shot_odds() would price it.
+
+    threat[is_enemy] holds, for every tile in tile_map order, the sum over
+    that faction's units of P(hit) * damage against an unarmoured, unsmoked
+    unit on the tile, using the unit's range, base_damage, accuracy and
+    morale and the tile's terrain modifiers. Those modifiers are how
+    calculate_damage() applies terrain defence; Tile.defense_bonus is not
+    part of the rules. Player shots are priced at their distance, as
+    attack() rolls them; enemy shots at ENEMY_SHOT_DISTANCE, as ai_shoot()
+    does.
+
+    Units are re-priced lazily: unit_changed() (moves, morale, accuracy)
+    only marks the unit, and the next query subtracts its old contribution
+    and adds the new one. rebuild() recomputes both grids in one vectorized
+    pass over every unit.
+    """
+    def __init__(self, tile_map):
+        self.coords = list(tile_map)
+        self.position = {coord: i for i, coord in enumerate(self.coords)}
+        qs = np.array([q for q, r in self.coords])
+        rs = np.array([r for q, r in self.coords])
+        self.q_min, self.r_min = int(qs.min()), int(rs.min())
+        # Dense (q, r) -> tile position lookup, -1 off the map
+        self.lookup = np.full((int(qs.max()) - self.q_min + 1, int(rs.max()) - self.r_min + 1), -1, dtype=np.intp)
+        self.lookup[qs - self.q_min, rs - self.r_min] = np.arange(len(self.coords))
+        terrain = np.array([TERRAIN_IDS.get(tile.terrain_type, TERRAIN_OTHER) for tile in tile_map.values()])
+        self.hit_modifiers = HIT_MODIFIER_TABLE[terrain]
+        self.damage_modifiers = DAMAGE_MODIFIER_TABLE[terrain]
+        self.threat = {False: np.zeros(len(self.coords)), True: np.zeros(len(self.coords))}
+        self.units = {}  # unit -> (tile positions, expected damage) it last added
+        self.dirty = {}  # Units to re-price before the next query
+        self.stale = False  # Everything needs re-pricing
+        self.cover = {}  # (is_enemy, radius) -> tiles within radius of one of that faction's units
+
+    # --- Bookkeeping ---
+    def add(self, unit):
+        self.dirty[unit] = None
+        self.forget_cover(unit.is_enemy)
+
+    def unit_changed(self, unit):
+        if unit in self.units or unit in self.dirty:
+            self.dirty[unit] = None
+
+    def unit_moved(self, unit):
+        self.unit_changed(unit)
+        self.forget_cover(unit.is_enemy)
+
+    def forget_cover(self, is_enemy):
+        for key in [key for key in self.cover if key[0] == is_enemy]:
+            del self.cover[key]
+
+    def remove(self, unit):
+        self.forget_cover(unit.is_enemy)
+        self.dirty.pop(unit, None)
+        entry = self.units.pop(unit, None)
+        if entry is not None:
+            positions, values = entry
+            np.subtract.at(self.threat[unit.is_enemy], positions, values)
+
+    def invalidate(self):
+        self.stale = True
+
+    # --- Pricing ---
+    def price(self, units):
+        """Return (positions, values) arrays of shape (units, offsets) for units of one faction sharing one range."""
+        offsets, distances = range_offsets(units[0].range)
+        if units[0].is_enemy:
+            distances = np.full_like(distances, ENEMY_SHOT_DISTANCE)
+        kinds = np.array([unit_kind(unit) for unit in units])
+        q = np.array([unit.q for unit in units])[:, None] + offsets[:, 0]
+        r = np.array([unit.r for unit in units])[:, None] + offsets[:, 1]
+        q -= self.q_min
+        r -= self.r_min
+        inside = (q >= 0) & (q < self.lookup.shape[0]) & (r >= 0) & (r < self.lookup.shape[1])
+        positions = np.where(inside, self.lookup[np.where(inside, q, 0), np.where(inside, r, 0)], -1)
+        on_map = positions >= 0
+        tiles = np.where(on_map, positions, 0)
+
+        if distances.max() <= MAX_TABLE_DISTANCE:
+            range_hit = np.array(RANGE_HIT_TABLE)[distances]
+            range_damage = np.array(RANGE_DAMAGE_TABLE)[kinds[:, None], distances]
+        else:
+            range_hit = np.where(distances > 1, 1 - (distances - 1) * 0.15, 1.0)
+            range_damage = np.array([[RANGE_DAMAGE_TABLE[kind][d] if d <= MAX_TABLE_DISTANCE else 1.0
+                                      for d in distances] for kind in kinds])
+        # Same factors in the same order as shot_odds(), so floor() lands the same way
+        accuracy = np.array([unit.accuracy for unit in units], dtype=float)[:, None]
+        morale = np.array([unit.morale for unit in units], dtype=float)[:, None]
+        hit_chance = accuracy * 1.2 * self.hit_modifiers[tiles]
+        hit_chance = hit_chance * (0.6 + (morale / 200))
+        hit_chance = hit_chance * range_hit
+        hit_probability = np.clip(np.floor(hit_chance), 0, 100) / 100
+        base_damage = np.array([unit.base_damage for unit in units], dtype=float)[:, None]
+        damage = np.floor(base_damage * self.damage_modifiers[tiles] * range_damage)
+        return positions, np.where(on_map, hit_probability * damage, 0.0)
+
+    def rebuild(self):
+        """Price every unit from scratch in one pass per weapon range."""
+        units = list(self.units) + [unit for unit in self.dirty if unit not in self.units]
+        for threat in self.threat.values():
+            threat.fill(0)
+        self.units.clear()
+        self.dirty.clear()
+        self.stale = False
+        groups = {}
+        for unit in units:
+            groups.setdefault((unit.range, unit.is_enemy), []).append(unit)
+        for group in groups.values():
+            self.add_priced(group)
+
+    def add_priced(self, units):
+        positions, values = self.price(units)
+        for i, unit in enumerate(units):
+            keep = positions[i] >= 0
+            self.units[unit] = (positions[i][keep], values[i][keep])
+        keep = positions >= 0
+        self.threat[units[0].is_enemy] += np.bincount(positions[keep], values[keep], minlength=len(self.coords))
+
+    def refresh(self):
+        if self.stale:
+            self.rebuild()
+            return
+        if not self.dirty:
+            return
+        changed = list(self.dirty)
+        self.dirty.clear()
+        groups = {}
+        for unit in changed:
+            entry = self.units.pop(unit, None)
+            if entry is not None:
+                np.subtract.at(self.threat[unit.is_enemy], *entry)
+            groups.setdefault((unit.range, unit.is_enemy), []).append(unit)
+        for group in groups.values():
+            self.add_priced(group)
+
+    # --- Queries ---
+    def covered(self, is_enemy, radius):
+        """Boolean array, in tile order, of tiles within radius of any unit of one faction."""
+        key = (is_enemy, radius)
+        cover = self.cover.get(key)
+        if cover is None:
+            self.refresh()
+            cover = np.zeros(len(self.coords), dtype=bool)
+            units = [unit for unit in self.units if unit.is_enemy == is_enemy]
+            if units:
+                offsets, _ = range_offsets(radius)
+                offsets = np.vstack([(0, 0), offsets])
+                q = np.array([unit.q for unit in units])[:, None] + offsets[:, 0] - self.q_min
+                r = np.array([unit.r for unit in units])[:, None] + offsets[:, 1] - self.r_min
+                inside = (q >= 0) & (q < self.lookup.shape[0]) & (r >= 0) & (r < self.lookup.shape[1])
+                positions = self.lookup[q[inside], r[inside]]
+                cover[positions[positions >= 0]] = True
+            self.cover[key] = cover
+        return cover
+
+    def safest(self, coords, is_enemy):
+        # The coordinate in coords where the other faction's threat is lowest, first on ties
+        self.refresh()
+        threat = self.threat[not is_enemy]
+        values = threat[[self.position[coord] for coord in coords]]
+        return coords[int(np.argmin(values))]
@@ -2,9 +2,18 @@ import pygame
 import math
 import random
 import os
+import json
 import cv2
 import numpy as np
-from game_objects import InfantryUnit, TankUnit, Tile, TERRAIN_TYPES, TERRAIN_COLORS
+import queue
+import threading
+from collections import OrderedDict, deque
+from game_objects import InfantryUnit, TankUnit, TERRAIN_TYPES, TERRAIN_COLORS
+from game_state import GameState, MISSIONS
+from hexgrid import hex_distance, hex_to_pixel, pixel_to_hex
+from combat import shot_odds, outcome_distribution
+from search import SearchAI
+from ai_worker import AiTurn
 from pygame import mixer
 
 # === CONFIGURATION ===
@@ -34,45 +43,75 @@ MENU_BORDER = (200, 200, 200)
 MESSAGE_LOG_HEIGHT = 200
 MESSAGE_LOG_WIDTH = 500
 MESSAGE_LOG_PADDING = 10
-MESSAGE_LOG_MAX_LINES = 15
+MESSAGE_LOG_CAPACITY = 50000  # Messages kept in the combat log history
 MESSAGE_LOG_LINE_HEIGHT = 25
 MESSAGE_LOG_BULLET = "- "
 BOTTOM_PANEL_HEIGHT = 200
+MAP_BACKGROUND = (10, 10, 20)
+HOVER_BORDER = (255, 255, 0)
+REACH_HIGHLIGHT = (90, 170, 255, 80)  # Translucent fill on hexes the selected unit can move to
+TARGET_HIGHLIGHT = (255, 140, 60, 90)  # Translucent fill on legal targets of the pending action
+# Action menu labels by action kind (see actions.py), and the kind of each pending target-picking action
+MENU_ACTIONS = {"attack": "Attack", "HE": "Fire HE Round", "APHE": "Fire APHE Round",
+                "grenade": "Throw Grenade", "smoke": "Throw Smoke"}
+PENDING_ACTION_KINDS = {"he_round": "HE", "aphe_round": "APHE", "grenade": "grenade", "smoke": "smoke"}
+AI_ACTION_MS = 350  # How long each enemy move or shot stays on screen before the next is applied
+ENEMY_TURN_BUDGET_MS = 1500  # Search time per enemy turn, spent in the worker process
+MAIN_THREAD_TURN_BUDGET_MS = 150  # Search time when no worker can be started and the UI thread plays the enemy
+TERRAIN_CHUNK_SIZE = 512  # Side in pixels of each pre-rendered terrain chunk
+TERRAIN_CHUNK_PADDING = 8  # Extra pixels rendered around each chunk
+TERRAIN_CHUNK_CACHE_MAX_ENTRIES = 40  # About 1.1 MB each; a 1600x900 screen shows at most 15
 SCROLL_STEP = 30  # How many pixels to scroll per wheel step
+VIDEO_BUFFER_FRAMES = 4  # Decoded menu video frames buffered ahead of display
+# Pre-decoded copy of the menu video, stored uncompressed at screen resolution
+# (about 5.8 MB per frame at 1600x900), so it is opt-in
+VIDEO_CACHE_ENABLED = False
+VIDEO_CACHE_DIR = os.path.join('video', 'cache')
+ASSET_CACHE_MAX_ENTRIES = 32  # Scaled portraits and campaign art
+ATLAS_CACHE_MAX_ENTRIES = 31  # One unit atlas per zoom step, hex sizes 20 to 80 in steps of 2
+PORTRAIT_SIZE = (200, 150)
+CAMPAIGN_IMAGE_SIZE = (280, 200)  # Slightly smaller than the campaign box
 
 # === DISPLAY SETTINGS ===
 is_fullscreen = False
 screen_width, screen_height = 1600, 900
 
 # === HEX UTILS ===
-def hex_to_pixel(q, r, size):
-    # Pointy topped hex coordinates
-    x = size * math.sqrt(3) * (q + r / 2)
-    y = size * 3/2 * r
-    return x, y
-
-def pixel_to_hex(x, y, size):
-    q = (x * math.sqrt(3)/3 - y / 3) / size
-    r = y * 2/3 / size
-    return hex_round(q, r)
-
-def hex_round(q, r):
-    x = q
-    z = r
-    y = -x - z
-    rx, ry, rz = round(x), round(y), round(z)
-    x_diff, y_diff, z_diff = abs(rx - x), abs(ry - y), abs(rz - z)
-    if x_diff > y_diff and x_diff > z_diff:
-        rx = -ry - rz
-    elif y_diff > z_diff:
-        ry = -rx - rz
-    else:
-        rz = -rx - ry
-    return int(rx), int(rz)
-
-def get_neighbors(q, r):
-    directions = [(+1, 0), (+1, -1), (0, -1), (-1, 0), (-1, +1), (0, +1)]
-    return [(q + dq, r + dr) for dq, dr in directions]
+class HexGeometry:
+    """Corner offsets and tile centers for one hex size.
+
+    Positions are in map space; panning only adds the camera offset, so the
+    geometry is rebuilt on zoom (or when a new map is loaded) and nowhere else.
+    """
+    def __init__(self, coords, size):
+        self.size = size
+        self.coords = list(coords)
+
+        # Pointy topped hex corners relative to the hex center
+        angles = np.radians(60 * np.arange(6) - 30)
+        corners = np.stack([size * np.cos(angles), size * np.sin(angles)], axis=1)
+        self.corner_offsets = [tuple(c) for c in corners.tolist()]
+
+        qs = np.array([q for q, r in self.coords], dtype=float)
+        rs = np.array([r for q, r in self.coords], dtype=float)
+        centers = np.stack([size * math.sqrt(3) * (qs + rs / 2), size * 3/2 * rs], axis=1)
+        self.center_of = {coord: tuple(c) for coord, c in zip(self.coords, centers.tolist())}
+
+    def center(self, q, r):
+        if (q, r) in self.center_of:
+            return self.center_of[(q, r)]
+        return hex_to_pixel(q, r, self.size)
+
+_hex_geometry = None
+
+def get_hex_geometry(size):
+    """Return the geometry for the current map at this hex size, rebuilding only on zoom or map change."""
+    global _hex_geometry
+    tile_map = game.tile_map
+    if _hex_geometry is None or _hex_geometry.size != size or _hex_geometry.tile_map is not tile_map:
+        _hex_geometry = HexGeometry(tile_map.keys(), size)
+        _hex_geometry.tile_map = tile_map
+    return _hex_geometry
 
 # === INIT PYGAME ===
 pygame.init()
@@ -82,16 +121,10 @@ pygame.display.set_caption("Hex Strategy Game")
 font = pygame.font.SysFont(None, 24)
 clock = pygame.time.Clock()
 
-# === MAP GENERATION ===
-MAP_RADIUS = 8
+# === MAP ===
 base_hex_size = 40
 hex_size = base_hex_size
-tile_map = {}
-for q in range(-MAP_RADIUS, MAP_RADIUS + 1):
-    for r in range(-MAP_RADIUS, MAP_RADIUS + 1):
-        if -q - r >= -MAP_RADIUS and -q - r <= MAP_RADIUS:
-            terrain = random.choice(TERRAIN_TYPES)
-            tile_map[(q, r)] = Tile(q, r, terrain)
+game = None  # GameState of the mission being played
 
 # === IMAGE UTILS ===
 def get_available_unit_images(unit_type):
@@ -131,34 +164,180 @@ def assign_unit_image(unit):
         unit.image_key = base_key
         unit.image_path = None
 
-# === LOAD IMAGES ===
-images = {}
-for key, paths in IMAGE_PATHS.items():
-    if isinstance(paths, list):
-        # For infantry, load all images
-        for path in paths:
-            if os.path.exists(path):
-                img = pygame.image.load(path)
-                if key in ["soldier", "ger_tank"]:
-                    # Scale soldier and tank images to a smaller size (about 90% of hex size)
-                    img = pygame.transform.scale(img, (int(hex_size * 0.9), int(hex_size * 0.9)))
-                else:
-                    img = pygame.transform.scale(img, (200, 150))
-                # Store the image with its full path as the key
-                images[path] = img
-    else:
-        if os.path.exists(paths):
-            img = pygame.image.load(paths)
-            if key in ["soldier", "ger_tank"]:
-                # Scale soldier and tank images to a smaller size (about 90% of hex size)
-                img = pygame.transform.scale(img, (int(hex_size * 0.9), int(hex_size * 0.9)))
-            else:
-                img = pygame.transform.scale(img, (200, 150))
-            # Store the image with both the key and the path
-            images[key] = img
-            images[paths] = img
-        else:
-            print(f"Missing image: {paths}")
+# === ASSETS ===
+class AssetManager:
+    """Images and fonts, loaded on first use and kept for later frames.
+
+    Source images are cached by path, scaled copies by (path, size) with
+    least-recently-used eviction past max_entries, and fonts by point size,
+    so steady-state frames do no disk I/O, scaling or font construction.
+    Generated surfaces (unit atlases) have an LRU of their own, bounded by
+    max_generated, so zooming through every size cannot push out the images.
+    """
+    def __init__(self, max_entries=ASSET_CACHE_MAX_ENTRIES, max_generated=ATLAS_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.max_generated = max_generated
+        self.sources = {}  # Path -> Surface, or None if the file could not be loaded
+        self.scaled = OrderedDict()
+        self.generated = OrderedDict()
+        self.fonts = {}
+        self.overlays = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path):
+        if path not in self.sources:
+            try:
+                self.sources[path] = to_display_format(pygame.image.load(path))
+            except (pygame.error, FileNotFoundError) as e:
+                print(f"Missing image: {path} ({e})")
+                self.sources[path] = None
+        return self.sources[path]
+
+    def lru(self, store, max_entries, key, factory):
+        surface = store.get(key)
+        if surface is not None:
+            store.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = factory()
+        store[key] = surface
+        if len(store) > max_entries:
+            store.popitem(last=False)
+        return surface
+
+    def cached(self, key, factory):
+        # Generated surfaces such as atlases, kept apart from the scaled images
+        return self.lru(self.generated, self.max_generated, key, factory)
+
+    def image(self, path, size=None):
+        """Return the image at path, scaled to size (width, height) if given, or None if missing."""
+        if size is None:
+            return self.load(path)
+
+        key = (path, size)
+        surface = self.scaled.get(key)
+        if surface is not None:
+            self.scaled.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        source = self.load(path)
+        if source is None:
+            self.misses += 1
+            return None
+        return self.lru(self.scaled, self.max_entries, key, lambda: pygame.transform.scale(source, size))
+
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont(None, size)
+        return self.fonts[size]
+
+    def overlay(self, size, color):
+        # Translucent full-screen fill used behind the menus
+        key = (size, color)
+        if key not in self.overlays:
+            overlay = pygame.Surface(size, pygame.SRCALPHA)
+            overlay.fill(color)
+            self.overlays[key] = to_display_format(overlay)
+        return self.overlays[key]
+
+    def memory_usage(self):
+        """Bytes of pixel data held by the scaled copies and generated surfaces."""
+        return (sum(entry.get_width() * entry.get_height() * entry.get_bytesize() for entry in self.scaled.values()) +
+                sum(entry.memory_usage() for entry in self.generated.values()))
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "entries": len(self.scaled),
+            "generated": len(self.generated),
+            "bytes": self.memory_usage(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+        }
+
+def to_display_format(surface):
+    # Match the display's pixel format so blits need no per-pixel conversion
+    if pygame.display.get_surface() is None:
+        return surface
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    return surface.convert()
+
+class UnitAtlas:
+    """Unit sprites and map markers for one hex size, packed into one surface.
+
+    draw_map hands the whole unit overlay to a single Surface.blits() call,
+    using draw() to position each piece by its anchor (the point that goes on
+    the hex center).
+    """
+    def __init__(self, size):
+        sprite_size = int(size * 0.9)
+        marker_radius = max(8, int(size / 4))
+        ring_radius = max(12, int(size / 3))
+
+        pieces = []
+        for key in ("soldier", "ger_tank"):
+            # Scaled straight from the source: once packed, the scaled copy is not needed again
+            source = assets.image(IMAGE_PATHS[key])
+            if source:
+                sprite = pygame.transform.scale(source, (sprite_size, sprite_size))
+                pieces.append((key, sprite, (sprite.get_width() // 2, sprite.get_height() // 2)))
+        for key, color, radius, width in (("player_marker", (0, 0, 255), marker_radius, 3),
+                                          ("enemy_marker", (255, 0, 0), marker_radius, 3),
+                                          ("target_ring", (0, 255, 0), ring_radius, 2)):
+            marker = pygame.Surface((2 * radius + 2, 2 * radius + 2), pygame.SRCALPHA)
+            pygame.draw.circle(marker, color, (radius + 1, radius + 1), radius, width)
+            pieces.append((key, marker, (radius + 1, radius + 1)))
+        # Hex-shaped tints for the move range and action targets, inset a pixel to leave the borders showing
+        inset = size - 1
+        half_width = int(math.ceil(inset * math.sqrt(3) / 2))
+        corners = [(half_width + inset * math.cos(math.radians(60 * i - 30)),
+                    inset + inset * math.sin(math.radians(60 * i - 30))) for i in range(6)]
+        for key, color in (("reach_tint", REACH_HIGHLIGHT), ("target_tint", TARGET_HIGHLIGHT)):
+            tint = pygame.Surface((2 * half_width, 2 * inset), pygame.SRCALPHA)
+            pygame.draw.polygon(tint, color, corners)
+            pieces.append((key, tint, (half_width, inset)))
+
+        self.surface = pygame.Surface((sum(piece.get_width() for _, piece, _ in pieces),
+                                       max(piece.get_height() for _, piece, _ in pieces)), pygame.SRCALPHA)
+        self.areas = {}
+        self.anchors = {}
+        x = 0
+        for key, piece, anchor in pieces:
+            # Copy the pixels as they are rather than alpha-blending onto the empty atlas
+            self.surface.blit(piece, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.areas[key] = pygame.Rect(x, 0, piece.get_width(), piece.get_height())
+            self.anchors[key] = anchor
+            x += piece.get_width()
+        self.surface = to_display_format(self.surface)
+
+    def draw(self, batch, key, x, y):
+        # Queue a piece centered on (x, y) for a later Surface.blits() call
+        if key in self.areas:
+            ax, ay = self.anchors[key]
+            batch.append((self.surface, (x - ax, y - ay), self.areas[key]))
+
+    def memory_usage(self):
+        return self.surface.get_width() * self.surface.get_height() * self.surface.get_bytesize()
+
+assets = AssetManager()
+
+def get_unit_atlas(size):
+    return assets.cached(("unit_atlas", size), lambda: UnitAtlas(size))
+
+def get_unit_portrait(path):
+    # The sprite sheets are shown at their base map size, photos at portrait size
+    if path in (IMAGE_PATHS["soldier"], IMAGE_PATHS["ger_tank"]):
+        size = int(base_hex_size * 0.9)
+        return assets.image(path, (size, size))
+    return assets.image(path, PORTRAIT_SIZE)
 
 # Create a simple gradient background
 def create_gradient_background():
@@ -185,15 +364,57 @@ class VideoBackground:
             self.fps = self.cap.get(cv2.CAP_PROP_FPS)
             self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
             self.frame_delay = 1000 / self.fps  # Delay in milliseconds
-            self.last_frame_time = pygame.time.get_ticks()
             
             # Get video dimensions
             width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
             height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
             
-            # Create a surface for the video frame
+            # Fit the frame to the screen while maintaining aspect ratio
+            aspect = width / height
+            if aspect > screen_width / screen_height:
+                new_w = screen_width
+                new_h = int(new_w / aspect)
+            else:
+                new_h = screen_height
+                new_w = int(new_h * aspect)
+            self.frame_size = (new_w, new_h)
+            self.frame_pos = ((screen_width - new_w) // 2, (screen_height - new_h) // 2)
+            
+            # Persistent surface the newest frame is copied into
             self.frame_surface = pygame.Surface((screen_width, screen_height))
             
+            # Frames are packed straight into the surface's 32-bit pixel format when
+            # it is a plain byte order, which makes blit_array a flat copy;
+            # otherwise they are kept as RGB triplets
+            masks = self.frame_surface.get_masks()[:3]
+            if self.frame_surface.get_bitsize() == 32 and masks == (0xff0000, 0xff00, 0xff):
+                self.color_conversion = cv2.COLOR_BGR2BGRA
+            elif self.frame_surface.get_bitsize() == 32 and masks == (0xff, 0xff00, 0xff0000):
+                self.color_conversion = cv2.COLOR_BGR2RGBA
+            else:
+                self.color_conversion = cv2.COLOR_BGR2RGB
+            packed = self.color_conversion != cv2.COLOR_BGR2RGB
+            
+            # Ring buffer of screen-sized frames (in surfarray layout) filled by the
+            # decoder thread; the borders stay black for letterboxing
+            buffer_shape = (screen_width, screen_height) if packed else (screen_width, screen_height, 3)
+            self.buffers = [np.zeros(buffer_shape, dtype=np.uint32 if packed else np.uint8)
+                            for _ in range(VIDEO_BUFFER_FRAMES)]
+            self.resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+            self.converted = np.empty((new_h, new_w, 4 if packed else 3), dtype=np.uint8)
+            self.converted_pixels = self.converted.view(np.uint32)[:, :, 0] if packed else self.converted
+            self.free_slots = queue.Queue()
+            self.ready = deque()  # (frame number, slot) in decoding order
+            self.stop_event = threading.Event()
+            self.thread = None
+            
+            # Optional pre-decoded copy of the video, played back through a memmap
+            self.video_path = video_path
+            self.cache = None
+            self.cache_index = None
+            self.open_cache()
+            self.start()
+            
             # Try multiple audio file formats
             audio_formats = ['.wav', '.mp3', '.ogg']
             audio_loaded = False
@@ -218,16 +439,133 @@ class VideoBackground:
             print(f"Error initializing video background: {e}")
             self.cap = None
     
+    def cache_paths(self):
+        name = os.path.splitext(os.path.basename(self.video_path))[0]
+        base = os.path.join(VIDEO_CACHE_DIR, f"{name}_{screen_width}x{screen_height}")
+        return base + ".raw", base + ".json"
+    
+    def cache_key(self):
+        # Everything the cached frames depend on; a mismatch means a rebuild
+        stat = os.stat(self.video_path)
+        return {
+            "source": os.path.abspath(self.video_path),
+            "source_size": stat.st_size,
+            "source_mtime": stat.st_mtime_ns,
+            "width": screen_width,
+            "height": screen_height,
+            "color_conversion": self.color_conversion,
+        }
+    
+    def open_cache(self):
+        """Map the pre-decoded frames if a cache for this source and resolution exists"""
+        self.cache = None
+        if not VIDEO_CACHE_ENABLED:
+            return
+        raw_path, meta_path = self.cache_paths()
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["key"] != self.cache_key():
+                return
+            shape = (meta["frames"],) + self.buffers[0].shape
+            self.cache = np.memmap(raw_path, dtype=self.buffers[0].dtype, mode="r", shape=shape)
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Warning: Ignoring video cache {raw_path}: {e}")
+    
+    def start(self):
+        """Start playback; decodes on a background thread unless the cache is ready"""
+        self.start_time = pygame.time.get_ticks()
+        self.cache_index = None
+        # Frames left over from the last decoding pass would hold off (or jump)
+        # cache playback, which only starts once nothing is waiting to be shown
+        self.ready.clear()
+        self.free_slots = queue.Queue()
+        for slot in range(len(self.buffers)):
+            self.free_slots.put(slot)
+        if self.cache is not None:
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.decode_frames, name="VideoDecoder", daemon=True)
+        self.thread.start()
+    
+    def stop_decoding(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+    
+    def decode_frames(self):
+        # Producer: decode, resize and convert frames into free ring buffer slots.
+        # With the cache enabled, the first full pass is also written to disk and
+        # playback switches to the memmap once it is complete.
+        frame_number = 0
+        cache_file = None
+        raw_path, meta_path = self.cache_paths()
+        if VIDEO_CACHE_ENABLED:
+            try:
+                os.makedirs(VIDEO_CACHE_DIR, exist_ok=True)
+                cache_file = open(raw_path + ".part", "wb")
+            except OSError as e:
+                print(f"Warning: Could not create video cache {raw_path}: {e}")
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    slot = self.free_slots.get(timeout=0.1)
+                except queue.Empty:
+                    continue  # All slots are waiting to be shown
+                
+                ret, frame = self.cap.read()
+                if not ret and cache_file is not None and frame_number > 0:
+                    # First pass done: publish the cache and play from it from now on
+                    self.free_slots.put(slot)
+                    cache_file.close()
+                    cache_file = None
+                    os.replace(raw_path + ".part", raw_path)
+                    with open(meta_path, "w") as f:
+                        json.dump({"key": self.cache_key(), "frames": frame_number}, f)
+                    self.open_cache()
+                    return
+                if not ret:
+                    # Loop back to the start of the video
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    ret, frame = self.cap.read()
+                    if not ret:
+                        print("Error getting video frame: could not read from the start of the video")
+                        return
+                
+                cv2.resize(frame, self.frame_size, dst=self.resized)
+                # Convert frame to the surface's channel order (OpenCV uses BGR)
+                cv2.cvtColor(self.resized, self.color_conversion, dst=self.converted)
+                x, y = self.frame_pos
+                self.buffers[slot][x:x + self.frame_size[0], y:y + self.frame_size[1]] = self.converted_pixels.swapaxes(0, 1)
+                if cache_file is not None:
+                    cache_file.write(self.buffers[slot].data)
+                
+                self.ready.append((frame_number, slot))
+                frame_number += 1
+        except Exception as e:
+            print(f"Error decoding video: {e}")
+        finally:
+            if cache_file is not None:
+                # Interrupted before the end of the first pass; drop the partial cache
+                cache_file.close()
+                os.remove(raw_path + ".part")
+    
     def stop(self):
         """Stop both video and music"""
         if self.cap is not None:
+            self.stop_decoding()
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Reset video to start
             pygame.mixer.music.stop()
     
     def restart(self):
         """Restart both video and music"""
         if self.cap is not None:
+            self.stop_decoding()
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Reset video to start
+            self.open_cache()  # The source may have changed since the cache was made
+            self.start()
             try:
                 pygame.mixer.music.load(os.path.join('video', 'intro.mp3'))
                 pygame.mixer.music.set_volume(0.7)
@@ -238,52 +576,29 @@ class VideoBackground:
     def get_frame(self):
         if self.cap is None:
             return background
-            
-        try:
-            # Check if it's time for the next frame
-            current_time = pygame.time.get_ticks()
-            if current_time - self.last_frame_time < self.frame_delay:
-                return self.frame_surface  # Return the last frame if not enough time has passed
-            
-            self.last_frame_time = current_time
-            
-            ret, frame = self.cap.read()
-            if not ret:
-                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                ret, frame = self.cap.read()
-                if not ret:
-                    return background
-            
-            # Convert frame to RGB (OpenCV uses BGR)
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Resize frame to screen dimensions while maintaining aspect ratio
-            h, w = frame.shape[:2]
-            aspect = w / h
-            if aspect > screen_width / screen_height:
-                new_w = screen_width
-                new_h = int(new_w / aspect)
-            else:
-                new_h = screen_height
-                new_w = int(new_h * aspect)
-            
-            frame = cv2.resize(frame, (new_w, new_h))
-            
-            # Create a black background
-            self.frame_surface.fill((0, 0, 0))
-            
-            # Calculate position to center the frame
-            x = (screen_width - new_w) // 2
-            y = (screen_height - new_h) // 2
-            
-            # Convert to pygame surface and blit centered
-            frame_surface = pygame.surfarray.make_surface(frame.swapaxes(0, 1))
-            self.frame_surface.blit(frame_surface, (x, y))
-            
+        
+        due = (pygame.time.get_ticks() - self.start_time) / self.frame_delay
+        
+        # Play from the memmap once the decoder has handed over all its frames
+        if self.cache is not None and not self.ready:
+            index = int(due) % len(self.cache)
+            if index != self.cache_index:
+                pygame.surfarray.blit_array(self.frame_surface, self.cache[index])
+                self.cache_index = index
             return self.frame_surface
-        except Exception as e:
-            print(f"Error getting video frame: {e}")
-            return background
+        
+        # Take the newest decoded frame that is due; frames we are late for are skipped
+        newest = None
+        while self.ready and self.ready[0][0] <= due:
+            _, slot = self.ready.popleft()
+            if newest is not None:
+                self.free_slots.put(newest)
+            newest = slot
+        
+        if newest is not None:
+            pygame.surfarray.blit_array(self.frame_surface, self.buffers[newest])
+            self.free_slots.put(newest)
+        return self.frame_surface
 
 # Initialize video background
 video_path = os.path.join('video', 'intro.mp4')
@@ -293,36 +608,14 @@ else:
     print(f"Warning: Video file not found at {video_path}")
     video_bg = None
 
-# === PLAYER UNIT ===
-units = []
-player_unit = InfantryUnit("German Infantry", 100, 20, 70, 5, 10, "ger_infantry", range_=1, is_enemy=False)
-player_unit.q, player_unit.r = 0, 0
-spawn_tile = tile_map[(0, 0)]
-spawn_tile.unit = player_unit
-units.append(player_unit)
-
-# Add a tank unit
-tank_unit = TankUnit("German Tank", 200, 40, 80, 3, 5, "ger_tank", range_=2, armor=50, armor_penetration=30, is_enemy=False)
-tank_unit.q, tank_unit.r = 1, 0
-tile_map[(1, 0)].unit = tank_unit
-units.append(tank_unit)
-
-# === ENEMY UNIT ===
-enemy_units = []
-enemy_unit = InfantryUnit("Russian Infantry", 100, 20, 60, 4, 10, "ger_infantry", range_=1, is_enemy=True)
-enemy_unit.q, enemy_unit.r = None, None
-for (q, r), tile in tile_map.items():
-    if tile.unit is None and abs(q) + abs(r) > 8:
-        tile.unit = enemy_unit
-        enemy_unit.q, enemy_unit.r = q, r
-        enemy_units.append(enemy_unit)
-        break
-
+# === UI STATE ===
 selected_unit = None
 action_menu_active = False
 action_menu_pos = None
 waiting_for_target = False
 current_action = None
+ai_turn = None  # AiTurn while the enemy's turn is being computed and played out
+ai_animation = None  # (action, ticks when applied) of the enemy action on screen
 
 # === CAMERA & ZOOM ===
 camera_offset_x, camera_offset_y = screen_width // 2, screen_height // 2 - 100
@@ -379,58 +672,59 @@ settings_buttons = [
     ("Back", (screen_width//2-100, screen_height//2+80, 200, 40)),
 ]
 
-# === MISSION DATA ===
-MISSIONS = {
-    0: {
-        "name": "Operation Case Blue - Mission 1",
-        "date": "June 28, 1942",
-        "description": "Initial assault on the Soviet positions. Secure the forward positions and establish a foothold.",
-        "player_pos": (0, 0),
-        "tank_pos": (1, 0)
-    },
-    1: {
-        "name": "Operation Case Blue - Mission 2",
-        "date": "July 1, 1942",
-        "description": "Advance through enemy territory. Capture key strategic positions and eliminate enemy resistance.",
-        "player_pos": (-2, 2),
-        "tank_pos": (-1, 2)
-    },
-    2: {
-        "name": "Soviet Counteroffensive - Mission 1",
-        "date": "July 15, 1942",
-        "description": "Lead the Soviet counterattack through the dense forests. Eliminate German positions and secure the area.",
-        "player_pos": (0, 0),
-        "tank_pos": (1, 0),
-        "is_russian": True,
-        "additional_units": [
-            {"type": "infantry", "pos": (-1, 1)},
-            {"type": "tank", "pos": (1, -1)}
-        ],
-        "enemy_units": [
-            {"type": "infantry", "pos": (3, 3)},
-            {"type": "infantry", "pos": (4, 2)},
-            {"type": "tank", "pos": (3, 2)}
-        ]
-    }
-}
-
 # === MESSAGE LOG ===
 class MessageLog:
-    def __init__(self):
-        self.messages = []
-        self.max_lines = MESSAGE_LOG_MAX_LINES
+    """Scrollable combat log holding up to MESSAGE_LOG_CAPACITY messages.
+
+    Messages live in a ring buffer together with the wrapped text of each one
+    and the running line offset where it starts (a prefix sum over line
+    counts), so appending is O(1) and the first message in view is found by
+    binary search. Only the messages inside the scroll window are rendered.
+    """
+    def __init__(self, capacity=MESSAGE_LOG_CAPACITY):
+        self.capacity = capacity
+        self.texts = [None] * capacity
+        self.lines = [None] * capacity  # Wrapped lines of each message
+        self.starts = [0] * capacity  # Absolute line index where each message starts
+        self.first = 0  # Sequence number of the oldest message kept
+        self.count = 0
+        self.total_lines = 0  # Absolute line index just past the newest message
         self.scroll_offset = 0
         self.max_scroll = 0
         self.content_height = 0
         self.was_at_bottom = True  # Track if we were at the bottom before adding a message
+        self.layout_width = None  # Width the stored lines were wrapped to
+        self.rendered = {}  # Sequence number -> line surfaces, for the messages last drawn
+    
+    def __len__(self):
+        return self.count
+    
+    def slot(self, seq):
+        return seq % self.capacity
+    
+    def first_line(self):
+        return self.starts[self.slot(self.first)] if self.count else self.total_lines
     
     def add_message(self, message):
         # Check if we were at the bottom before adding the message
         self.was_at_bottom = (self.scroll_offset >= self.max_scroll - 1)
         
-        self.messages.append(message)
-        if len(self.messages) > self.max_lines:
-            self.messages.pop(0)
+        if self.count == self.capacity:
+            # Drop the oldest message; keep the view still if scrolled up
+            dropped = len(self.lines[self.slot(self.first)] or ())
+            self.rendered.pop(self.first, None)
+            self.first += 1
+            self.count -= 1
+            if not self.was_at_bottom:
+                self.scroll_offset = max(0, self.scroll_offset - dropped * MESSAGE_LOG_LINE_HEIGHT)
+        
+        slot = self.slot(self.first + self.count)
+        self.texts[slot] = message
+        self.lines[slot] = self.wrap_text(message, self.layout_width) if self.layout_width is not None else None
+        self.starts[slot] = self.total_lines
+        self.total_lines += len(self.lines[slot] or ())
+        self.count += 1
+        self.content_height = (self.total_lines - self.first_line()) * MESSAGE_LOG_LINE_HEIGHT
         
         # Only reset scroll if we were at the bottom
         if self.was_at_bottom:
@@ -457,12 +751,41 @@ class MessageLog:
         
         return lines
     
-    def calculate_content_height(self, available_width):
-        total_height = 0
-        for message in self.messages:
-            wrapped_lines = self.wrap_text(message, available_width)
-            total_height += len(wrapped_lines) * MESSAGE_LOG_LINE_HEIGHT
-        return total_height
+    def update_layout(self, content_width):
+        # Leave room for the bullet point on the first line of each message
+        width = content_width - font.size(MESSAGE_LOG_BULLET)[0]
+        if width == self.layout_width:
+            return
+        # The width changed: rewrap everything and rebuild the line offsets
+        self.layout_width = width
+        self.rendered = {}
+        line = self.first_line()
+        for seq in range(self.first, self.first + self.count):
+            slot = self.slot(seq)
+            self.lines[slot] = self.wrap_text(self.texts[slot], width)
+            self.starts[slot] = line
+            line += len(self.lines[slot])
+        self.total_lines = line
+        self.content_height = self.calculate_content_height()
+    
+    def calculate_content_height(self):
+        return (self.total_lines - self.first_line()) * MESSAGE_LOG_LINE_HEIGHT
+    
+    def find_message(self, line):
+        # Binary search the line offsets for the message containing an absolute line
+        lo, hi = self.first, self.first + self.count - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.starts[self.slot(mid)] <= line:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+    
+    def render_message(self, seq):
+        lines = self.lines[self.slot(seq)]
+        return [font.render(MESSAGE_LOG_BULLET + line if i == 0 else line, True, MENU_TEXT)
+                for i, line in enumerate(lines)]
     
     def handle_scroll(self, amount):
         # Calculate new scroll offset
@@ -482,8 +805,8 @@ class MessageLog:
         # Calculate available width for content
         content_width = width - (2 * MESSAGE_LOG_PADDING)
         
-        # Calculate total content height
-        self.content_height = self.calculate_content_height(content_width)
+        # Wrap messages again only if the width changed since last time
+        self.update_layout(content_width)
         
         # Calculate visible height
         visible_height = height - (2 * MESSAGE_LOG_PADDING)
@@ -502,22 +825,22 @@ class MessageLog:
         old_clip = surface.get_clip()
         surface.set_clip(clip_rect)
         
-        # Draw messages
-        y_offset = y + MESSAGE_LOG_PADDING - self.scroll_offset
-        
-        for message in self.messages:
-            # Wrap the message text
-            wrapped_lines = self.wrap_text(message, content_width - font.size(MESSAGE_LOG_BULLET)[0])
-            
-            # Draw each line of the wrapped message
-            for i, line in enumerate(wrapped_lines):
-                # Add bullet point to first line of each message
-                if i == 0:
-                    line = MESSAGE_LOG_BULLET + line
-                
-                text = font.render(line, True, MENU_TEXT)
-                surface.blit(text, (x + MESSAGE_LOG_PADDING, y_offset))
-                y_offset += MESSAGE_LOG_LINE_HEIGHT
+        # Draw only the messages inside the scroll window
+        rendered = {}
+        if self.count:
+            first_line = self.first_line()
+            seq = self.find_message(first_line + self.scroll_offset // MESSAGE_LOG_LINE_HEIGHT)
+            y_offset = y + MESSAGE_LOG_PADDING - self.scroll_offset + \
+                (self.starts[self.slot(seq)] - first_line) * MESSAGE_LOG_LINE_HEIGHT
+            bottom = y + MESSAGE_LOG_PADDING + visible_height
+            while seq < self.first + self.count and y_offset < bottom:
+                lines = self.rendered.get(seq) or self.render_message(seq)
+                rendered[seq] = lines
+                for text in lines:
+                    surface.blit(text, (x + MESSAGE_LOG_PADDING, y_offset))
+                    y_offset += MESSAGE_LOG_LINE_HEIGHT
+                seq += 1
+        self.rendered = rendered
         
         # Restore original clipping rectangle
         surface.set_clip(old_clip)
@@ -525,7 +848,7 @@ class MessageLog:
         # Draw scroll indicator if there's more content than can be displayed
         if self.content_height > visible_height:
             # Calculate scroll indicator position
-            indicator_height = visible_height * (visible_height / self.content_height)
+            indicator_height = max(5, visible_height * (visible_height / self.content_height))
             indicator_pos = (self.scroll_offset / self.max_scroll) * (visible_height - indicator_height)
             
             # Draw scroll indicator
@@ -537,58 +860,204 @@ class MessageLog:
 message_log = MessageLog()
 
 # === DRAW FUNCTIONS ===
-def draw_hex(q, r, color, size, surface, border_color=(0, 0, 0)):
+def draw_hex(q, r, color, size, surface, border_color=(0, 0, 0), offset=None):
     # Pointy topped hex points
-    cx, cy = hex_to_pixel(q, r, size)
-    cx += camera_offset_x
-    cy += camera_offset_y
-    points = [(cx + size * math.cos(math.radians(60 * i - 30)),
-               cy + size * math.sin(math.radians(60 * i - 30))) for i in range(6)]
-    pygame.draw.polygon(surface, color, points)
+    if offset is None:
+        offset = (camera_offset_x, camera_offset_y)
+    geometry = get_hex_geometry(size)
+    cx, cy = geometry.center(q, r)
+    cx += offset[0]
+    cy += offset[1]
+    points = [(cx + dx, cy + dy) for dx, dy in geometry.corner_offsets]
+    if color is not None:
+        pygame.draw.polygon(surface, color, points)
     pygame.draw.polygon(surface, border_color, points, 2)
-    return pygame.Rect(min(p[0] for p in points), min(p[1] for p in points), size * 2, size * 2)
+    return pygame.Rect(cx - size * math.sqrt(3) / 2, cy - size, size * 2, size * 2)
+
+def visible_coords(left, top, right, bottom, size):
+    """Yield the axial coordinates of map tiles overlapping a map-space pixel rect.
+
+    Uses the inverse of hex_to_pixel to bound the rows and, per row, the
+    columns, so the cost depends on the area of the rect and not on the map.
+    """
+    hex_width = size * math.sqrt(3)
+    r_min = math.floor((top - size) / (size * 3/2))
+    r_max = math.ceil((bottom + size) / (size * 3/2))
+    for r in range(r_min, r_max + 1):
+        q_min = math.floor((left - hex_width / 2) / hex_width - r / 2)
+        q_max = math.ceil((right + hex_width / 2) / hex_width - r / 2)
+        for q in range(q_min, q_max + 1):
+            if (q, r) in game.tile_map:
+                yield q, r
+
+def visible_tiles():
+    # Tiles that can be seen with the current camera and zoom
+    return visible_coords(-camera_offset_x, -camera_offset_y,
+                          screen_width - camera_offset_x, screen_height - camera_offset_y, hex_size)
+
+def pick_tile(pos):
+    """Return the axial coordinate of the map tile under a screen position, or None.
+
+    Inverts the camera and zoom transform and rounds to the containing hex, so
+    picking is exact and costs the same whatever the size of the map.
+    """
+    q, r = pixel_to_hex(pos[0] - camera_offset_x, pos[1] - camera_offset_y, hex_size)
+    if (q, r) in game.tile_map:
+        return q, r
+    return None
+
+def get_tile_color(tile):
+    if tile.smoke and tile.smoke_turns > 0:  # Only show smoke if it has turns remaining
+        return (255, 255, 255)  # White color for smoke
+    return TERRAIN_COLORS[tile.terrain_type]
+
+class TerrainLayer:
+    """Pre-rendered hexes of the map, kept as square chunks of map space.
+
+    Chunks are rendered the first time they scroll into view and thrown away
+    when the tile map (mission) or the hex size changes. In between they are
+    kept least recently drawn first, and past max_chunks the off-screen ones
+    longest out of view are dropped, so memory follows the screen rather
+    than how much of the map has been looked at. Tiles whose look changes
+    (smoke) are marked with invalidate_tile() and repainted in place on the
+    next draw.
+    """
+    def __init__(self, max_chunks=TERRAIN_CHUNK_CACHE_MAX_ENTRIES):
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()  # (column, row) -> Surface covering TERRAIN_CHUNK_SIZE square pixels
+        self.tile_map = None
+        self.hex_size = None
+        self.dirty_tiles = set()
+
+    def invalidate_tile(self, q, r):
+        self.dirty_tiles.add((q, r))
+
+    def reset(self, tile_map, size):
+        self.chunks.clear()
+        self.tile_map = tile_map
+        self.hex_size = size
+        self.dirty_tiles.clear()
+
+    def chunk_offset(self, column, row):
+        # Map-space to chunk-surface offset; chunks keep a padding border so that
+        # hexes crossing the chunk edge are rasterized exactly as when unclipped
+        return (TERRAIN_CHUNK_PADDING - column * TERRAIN_CHUNK_SIZE,
+                TERRAIN_CHUNK_PADDING - row * TERRAIN_CHUNK_SIZE)
+
+    def build_chunk(self, column, row):
+        left, top = column * TERRAIN_CHUNK_SIZE, row * TERRAIN_CHUNK_SIZE
+        side = TERRAIN_CHUNK_SIZE + 2 * TERRAIN_CHUNK_PADDING
+        chunk = pygame.Surface((side, side))
+        chunk.fill(MAP_BACKGROUND)
+        offset = self.chunk_offset(column, row)
+        for q, r in visible_coords(left - TERRAIN_CHUNK_PADDING, top - TERRAIN_CHUNK_PADDING,
+                                   left + TERRAIN_CHUNK_SIZE + TERRAIN_CHUNK_PADDING,
+                                   top + TERRAIN_CHUNK_SIZE + TERRAIN_CHUNK_PADDING, self.hex_size):
+            draw_hex(q, r, get_tile_color(self.tile_map[(q, r)]), self.hex_size, chunk, offset=offset)
+        self.chunks[(column, row)] = chunk
+        return chunk
+
+    def repaint_tile(self, tile):
+        # A hex can straddle up to four chunks; repaint it in every one that is built
+        geometry = get_hex_geometry(self.hex_size)
+        cx, cy = geometry.center(tile.q, tile.r)
+        reach = self.hex_size + TERRAIN_CHUNK_PADDING
+        for column in range(int((cx - reach) // TERRAIN_CHUNK_SIZE), int((cx + reach) // TERRAIN_CHUNK_SIZE) + 1):
+            for row in range(int((cy - reach) // TERRAIN_CHUNK_SIZE), int((cy + reach) // TERRAIN_CHUNK_SIZE) + 1):
+                chunk = self.chunks.get((column, row))
+                if chunk is not None:
+                    draw_hex(tile.q, tile.r, get_tile_color(tile), self.hex_size, chunk,
+                             offset=self.chunk_offset(column, row))
+
+    def draw(self, surface, tile_map, size, offset):
+        if tile_map is not self.tile_map or size != self.hex_size:
+            self.reset(tile_map, size)
+        elif self.dirty_tiles:
+            for q, r in self.dirty_tiles:
+                if (q, r) in tile_map:
+                    self.repaint_tile(tile_map[(q, r)])
+            self.dirty_tiles.clear()
+
+        # Blit only the chunks under the screen
+        width, height = surface.get_size()
+        first_column, first_row = int(-offset[0] // TERRAIN_CHUNK_SIZE), int(-offset[1] // TERRAIN_CHUNK_SIZE)
+        last_column = int((width - offset[0]) // TERRAIN_CHUNK_SIZE)
+        last_row = int((height - offset[1]) // TERRAIN_CHUNK_SIZE)
+        for column in range(first_column, last_column + 1):
+            for row in range(first_row, last_row + 1):
+                chunk = self.chunks.get((column, row))
+                if chunk is None:
+                    chunk = self.build_chunk(column, row)
+                else:
+                    self.chunks.move_to_end((column, row))
+                surface.blit(chunk, (column * TERRAIN_CHUNK_SIZE + offset[0], row * TERRAIN_CHUNK_SIZE + offset[1]),
+                             (TERRAIN_CHUNK_PADDING, TERRAIN_CHUNK_PADDING, TERRAIN_CHUNK_SIZE, TERRAIN_CHUNK_SIZE))
+        # The chunks just drawn are the newest, so only off-screen ones are dropped
+        in_view = (last_column - first_column + 1) * (last_row - first_row + 1)
+        while len(self.chunks) > max(self.max_chunks, in_view):
+            self.chunks.popitem(last=False)
+
+terrain_layer = TerrainLayer()
 
 def draw_map():
-    tile_rects = {}
-    for (q, r), tile in tile_map.items():
-        color = TERRAIN_COLORS[tile.terrain_type]
-        if tile.smoke and tile.smoke_turns > 0:  # Only show smoke if it has turns remaining
-            color = (255, 255, 255)  # White color for smoke
-        rect = draw_hex(q, r, color, hex_size, screen)
-        tile_rects[(q, r)] = rect
-        if tile.unit:
-            cx, cy = hex_to_pixel(q, r, hex_size)
-            cx += camera_offset_x
-            cy += camera_offset_y
-            if not tile.unit.is_enemy:
-                if isinstance(tile.unit, InfantryUnit):
-                    # Draw soldier sprite for German infantry, blue circle for Russian
-                    if "German" in tile.unit.name:
-                        if "soldier" in images:
-                            soldier_img = images["soldier"]
-                            soldier_rect = soldier_img.get_rect(center=(int(cx), int(cy)))
-                            screen.blit(soldier_img, soldier_rect)
-                    else:
-                        # Draw blue circle for Russian infantry
-                        pygame.draw.circle(screen, (0, 0, 255), (int(cx), int(cy)), max(8, int(hex_size / 4)), 3)
+    geometry = get_hex_geometry(hex_size)
+    terrain_layer.draw(screen, game.tile_map, hex_size, (camera_offset_x, camera_offset_y))
+
+    # Tint where the selected unit can move, or what the pending action can
+    # target; the engine caches the range until something moves
+    atlas = get_unit_atlas(hex_size)
+    if selected_unit and game.turn_player and game.on_map(selected_unit):
+        kind = PENDING_ACTION_KINDS.get(current_action) if waiting_for_target else "move"
+        highlights = []
+        if kind:
+            key = "target_tint" if waiting_for_target else "reach_tint"
+            for q, r in game.actions.tiles(game.actions.targets(selected_unit, kind)):
+                cx, cy = geometry.center_of[(q, r)]
+                atlas.draw(highlights, key, int(cx + camera_offset_x), int(cy + camera_offset_y))
+        screen.blits(highlights, doreturn=False)
+
+    # Outline the hex under the mouse
+    hovered = pick_tile(pygame.mouse.get_pos())
+    if hovered:
+        draw_hex(hovered[0], hovered[1], None, hex_size, screen, border_color=HOVER_BORDER)
+
+    # The enemy action on screen: a unit sliding to its new tile, or a shooter and its target
+    sliding, marked = None, ()
+    if ai_animation:
+        action, started = ai_animation
+        if action[0] == "move":
+            progress = min(1.0, (pygame.time.get_ticks() - started) / AI_ACTION_MS)
+            sliding = (game.zobrist.units[action[1]], action[2], progress)
+        elif action[0] == "shoot":
+            marked = (game.zobrist.units[action[1]], game.zobrist.units[action[2]])
+
+    # Queue every visible unit and blit them all in one batch
+    batch = []
+    for q, r in visible_tiles():
+        unit = game.tile_map[(q, r)].unit
+        if unit:
+            cx, cy = geometry.center_of[(q, r)]
+            if sliding and unit is sliding[0]:
+                fx, fy = geometry.center_of[sliding[1]]
+                cx = fx + (cx - fx) * sliding[2]
+                cy = fy + (cy - fy) * sliding[2]
+            cx = int(cx + camera_offset_x)
+            cy = int(cy + camera_offset_y)
+            if not unit.is_enemy:
+                if "German" in unit.name:
+                    # Soldier sprite for German infantry, tank sprite for German tanks
+                    atlas.draw(batch, "soldier" if isinstance(unit, InfantryUnit) else "ger_tank", cx, cy)
                 else:
-                    # Draw tank sprite for German tank, blue circle for Russian
-                    if "German" in tile.unit.name:
-                        if "ger_tank" in images:
-                            tank_img = images["ger_tank"]
-                            tank_rect = tank_img.get_rect(center=(int(cx), int(cy)))
-                            screen.blit(tank_img, tank_rect)
-                    else:
-                        # Draw blue circle for Russian tank
-                        pygame.draw.circle(screen, (0, 0, 255), (int(cx), int(cy)), max(8, int(hex_size / 4)), 3)
+                    # Blue circle for Russian units
+                    atlas.draw(batch, "player_marker", cx, cy)
             else:
-                # Draw red circle for enemy units
-                pygame.draw.circle(screen, (255, 0, 0), (int(cx), int(cy)), max(8, int(hex_size / 4)), 3)
+                # Red circle for enemy units
+                atlas.draw(batch, "enemy_marker", cx, cy)
             
-            # Draw action indicator if unit is selected and waiting for target
-            if tile.unit == selected_unit and waiting_for_target:
-                pygame.draw.circle(screen, (0, 255, 0), (int(cx), int(cy)), max(12, int(hex_size / 3)), 2)
-    return tile_rects
+            # Draw action indicator if unit is selected and waiting for target, or is in the enemy's shot
+            if (unit == selected_unit and waiting_for_target) or unit in marked:
+                atlas.draw(batch, "target_ring", cx, cy)
+    screen.blits(batch, doreturn=False)
 
 def draw_action_menu():
     if not action_menu_active or not action_menu_pos:
@@ -596,18 +1065,12 @@ def draw_action_menu():
 
     menu_items = []
     if selected_unit:
-        if selected_unit.agility_points >= 2:
-            if isinstance(selected_unit, TankUnit):
-                if selected_unit.he_rounds > 0:
-                    menu_items.append("Fire HE Round")
-                if selected_unit.aphe_rounds > 0:
-                    menu_items.append("Fire APHE Round")
-            else:
-                menu_items.append("Attack")
-                if selected_unit.grenades > 0:
-                    menu_items.append("Throw Grenade")
-                if selected_unit.smoke_grenades > 0:
-                    menu_items.append("Throw Smoke")
+        # One button per kind of action the unit has a legal target for; tanks
+        # shoot from the menu with their main gun only (a left click still attacks)
+        kinds = game.actions.kinds(selected_unit)
+        if isinstance(selected_unit, TankUnit):
+            kinds = [kind for kind in kinds if kind != "attack"]
+        menu_items = [MENU_ACTIONS[kind] for kind in kinds if kind in MENU_ACTIONS]
         menu_items.append("Status Report")
 
     if not menu_items:
@@ -695,6 +1158,44 @@ def handle_menu_click(pos):
             return True
     return False
 
+def draw_shot_tooltip():
+    # Odds of the selected unit's shot at the enemy under the mouse
+    if not selected_unit or selected_unit.is_enemy or not game.turn_player or action_menu_active:
+        return
+    coord = pick_tile(pygame.mouse.get_pos())
+    target = game.tile_map[coord].unit if coord else None
+    if not target or not target.is_enemy:
+        return
+
+    if waiting_for_target and current_action in ["he_round", "aphe_round"]:
+        ammo_type = "HE" if current_action == "he_round" else "APHE"
+        distance = 1  # Main gun rounds resolve as point blank
+    elif not waiting_for_target:
+        ammo_type = None
+        distance = hex_distance(selected_unit.q, selected_unit.r, target.q, target.r)
+    else:
+        return
+
+    if ammo_type is None and distance > selected_unit.range:
+        lines = ["Out of range"]
+    else:
+        hit_probability, damage = shot_odds(selected_unit, target, game.tile_map[coord], ammo_type, distance)
+        knock_out = sum(outcome["probability"] for outcome in
+                        outcome_distribution(selected_unit, target, game.tile_map[coord], ammo_type, distance)
+                        if outcome["status"] != "active")
+        lines = [f"Hit {hit_probability:.0%}  Damage {damage}",
+                 f"Expected {hit_probability * damage:.1f}  Knock out {knock_out:.0%}"]
+
+    texts = [font.render(line, True, MENU_TEXT) for line in lines]
+    width = max(text.get_width() for text in texts) + MENU_PADDING * 2
+    height = len(texts) * MESSAGE_LOG_LINE_HEIGHT + MENU_PADDING
+    mx, my = pygame.mouse.get_pos()
+    box = pygame.Rect(min(mx + 16, screen_width - width), max(0, my - height - 8), width, height)
+    pygame.draw.rect(screen, MENU_BACKGROUND, box)
+    pygame.draw.rect(screen, MENU_BORDER, box, 1)
+    for i, text in enumerate(texts):
+        screen.blit(text, (box.x + MENU_PADDING, box.y + MENU_PADDING + i * MESSAGE_LOG_LINE_HEIGHT))
+
 def draw_bottom_panel():
     # Draw the permanent bottom panel
     pygame.draw.rect(screen, (30, 30, 30), (0, screen_height - BOTTOM_PANEL_HEIGHT, screen_width, BOTTOM_PANEL_HEIGHT))
@@ -707,8 +1208,9 @@ def draw_bottom_panel():
 
 def draw_unit_info(unit):
     # Draw unit image
-    if unit.image_path and unit.image_path in images:
-        screen.blit(images[unit.image_path], (20, screen_height - BOTTOM_PANEL_HEIGHT + 10))
+    portrait = get_unit_portrait(unit.image_path) if unit.image_path else None
+    if portrait:
+        screen.blit(portrait, (20, screen_height - BOTTOM_PANEL_HEIGHT + 10))
     
     # Draw unit status
     status_messages = unit.get_status_report()
@@ -717,11 +1219,11 @@ def draw_unit_info(unit):
         screen.blit(text, (240, screen_height - BOTTOM_PANEL_HEIGHT + 10 + i * 25))
 
 def draw_end_turn_button():
-    # Move button to top-right corner
+    # Move button to top-right corner; it stops the enemy while the enemy is moving
     btn_rect = pygame.Rect(screen_width - 150, 20, 130, 40)
     pygame.draw.rect(screen, (100, 100, 255), btn_rect)
     pygame.draw.rect(screen, (255, 255, 255), btn_rect, 2)
-    text = font.render("End Turn", True, (255, 255, 255))
+    text = font.render("Stop Enemy" if ai_turn else "End Turn", True, (255, 255, 255))
     screen.blit(text, (btn_rect.x + 20, btn_rect.y + 10))
     return btn_rect
 
@@ -738,417 +1240,122 @@ def draw_message_log():
     # Draw message log at the bottom of the screen
     message_log.draw(screen, screen_width - MESSAGE_LOG_WIDTH - 20, screen_height - MESSAGE_LOG_HEIGHT - 20, MESSAGE_LOG_WIDTH, MESSAGE_LOG_HEIGHT)
 
-# === COMBAT FUNCTIONS ===
-def calculate_damage(attacker, defender, tile, ammo_type=None, distance=1):
-    # Base damage calculation
-    damage = attacker.base_damage
-    
-    # Calculate base hit chance based on unit stats
-    base_hit_chance = attacker.accuracy * 1.2  # Increase base accuracy by 20%
-    
-    # Apply terrain modifiers to hit chance
-    terrain_modifiers = {
-        "House": 0.8,    # Units in houses are harder to hit (was 0.7)
-        "Hill": 0.85,    # Units on hills are harder to hit (was 0.8)
-        "Forest": 0.8,   # Units in forests are harder to hit (was 0.75)
-        "Bridge": 1.3,   # Units on bridges are easier to hit
-        "Plains": 1.0,   # Normal hit chance on plains
-        "Road": 1.0,     # Normal hit chance on roads
-        "River": 0.0,    # Can't hit units in river (they can't be there anyway)
-    }
-    
-    # Apply terrain modifier to hit chance
-    hit_chance = base_hit_chance * terrain_modifiers.get(tile.terrain_type, 1.0)
-    
-    # Apply morale modifier to hit chance (higher morale = better accuracy)
-    morale_modifier = 0.6 + (attacker.morale / 200)  # 0.6 to 1.6 range (was 0.5 to 1.5)
-    hit_chance *= morale_modifier
-    
-    # Apply range penalty (reduced penalty)
-    if distance > 1:
-        hit_chance *= (1 - (distance - 1) * 0.15)  # 15% penalty per hex of distance (was 20%)
-    
-    # Apply smoke effects (reduced penalty)
-    if defender.smoke_affected:
-        hit_chance *= 0.6  # 40% penalty (was 50%)
-    
-    # Roll for hit
-    hit_roll = random.randint(1, 100)
-    if hit_roll > hit_chance:
-        return 0  # Miss
-    
-    # If hit, calculate damage
-    damage = attacker.base_damage
-    
-    # Apply terrain effects to damage
-    if tile.terrain_type == "House":
-        damage *= 0.7
-    elif tile.terrain_type == "Hill":
-        damage *= 0.9
-    
-    # Initialize armor reduction
-    armor_reduction = 0
-    
-    # Apply ammunition type effects
-    if isinstance(attacker, TankUnit):
-        if ammo_type == "HE":
-            if isinstance(defender, InfantryUnit):
-                damage *= 1.5
-            else:
-                damage *= 0.8
-            armor_reduction = max(0, defender.armor - attacker.armor_penetration)
-        elif ammo_type == "APHE":
-            if isinstance(defender, TankUnit):
-                damage *= 1.3
-                armor_reduction = max(0, defender.armor - attacker.armor_penetration * 1.5)
-            else:
-                damage *= 0.7
-                armor_reduction = max(0, defender.armor - attacker.armor_penetration)
-        else:
-            armor_reduction = max(0, defender.armor - attacker.armor_penetration)
-    else:
-        armor_reduction = max(0, defender.armor - attacker.armor_penetration)
-    
-    # Apply armor reduction
-    damage *= (1 - (armor_reduction / 100))
-    
-    # Apply range damage reduction for infantry (reduced penalty)
-    if isinstance(attacker, InfantryUnit):
-        if distance == 2:
-            damage *= 0.85  # 15% reduction (was 20%)
-        elif distance == 3:
-            damage *= 0.7   # 30% reduction (was 40%)
-    
-    # Reduce defender's morale based on damage taken
-    morale_loss = int(damage / 5)  # 1 morale loss per 5 damage
-    defender.morale = max(0, defender.morale - morale_loss)
-    
-    return int(damage)
-
-def get_combat_message(attacker, defender, damage, distance, ammo_type=None):
-    messages = []
-    
-    # Get terrain type for the defender
-    defender_terrain = defender.tile_map[(defender.q, defender.r)].terrain_type
-    
-    # Create initial attack message with distance and terrain
-    distance_text = "point blank" if distance == 1 else f"{distance} hexes away"
-    terrain_text = f"on {defender_terrain.lower()}" if defender_terrain != "Plains" else "in the open"
-    
-    if isinstance(attacker, TankUnit):
-        if ammo_type == "HE":
-            messages.append(f"{attacker.name} fires a High Explosive round at {defender.name} {distance_text} {terrain_text}!")
-        elif ammo_type == "APHE":
-            messages.append(f"{attacker.name} fires an Armor Piercing round at {defender.name} {distance_text} {terrain_text}!")
-        else:
-            messages.append(f"{attacker.name} engages {defender.name} {distance_text} {terrain_text}!")
-    else:
-        messages.append(f"{attacker.name} opens fire on {defender.name} {distance_text} {terrain_text}!")
-    
-    # Damage and result messages
-    if damage > 0:
-        if isinstance(defender, TankUnit):
-            soldier_loss = max(1, int(damage / 10))
-            if damage > defender.health * 0.5:
-                messages.append(f"Critical hit! The round penetrates the armor, causing severe damage! The tank takes {damage} damage!")
-            elif damage > defender.health * 0.2:
-                messages.append(f"The round strikes the tank, causing moderate damage! The tank takes {damage} damage!")
-            else:
-                messages.append(f"The round glances off the armor, causing minor damage! The tank takes {damage} damage!")
-        else:
-            soldier_loss = max(1, int(damage / 10))
-            if soldier_loss > defender.soldiers * 0.5:
-                messages.append(f"Devastating fire! {soldier_loss} soldiers fall! The unit takes {damage} damage!")
-            elif soldier_loss > defender.soldiers * 0.2:
-                messages.append(f"Heavy casualties! {soldier_loss} soldiers are hit! The unit takes {damage} damage!")
-            else:
-                messages.append(f"{soldier_loss} soldiers are wounded! The unit takes {damage} damage!")
-        
-        # Add morale effect message
-        if defender.morale < 30:
-            messages.append(f"The unit's morale is critically low at {defender.morale}%!")
-        elif defender.morale < 50:
-            messages.append(f"The unit's morale is wavering at {defender.morale}%!")
-    else:
-        if isinstance(attacker, TankUnit):
-            messages.append(f"The round misses its target, exploding harmlessly in the distance!")
-        else:
-            messages.append(f"The shots go wide, failing to find their mark!")
-    
-    # Add terrain effect message if relevant
-    if damage > 0:
-        if defender_terrain == "House":
-            messages.append("The building provides some cover from the attack!")
-        elif defender_terrain == "Hill":
-            messages.append("The elevated position helps mitigate the damage!")
-        elif defender_terrain == "Bridge":
-            messages.append("The exposed position on the bridge makes the unit more vulnerable!")
-        elif defender_terrain == "Forest":
-            messages.append("The dense forest provides some protection from the attack!")
-    
-    # Add smoke effect message if applicable
-    if defender.smoke_affected:
-        messages.append("The smoke screen helps protect the unit from the attack!")
-    
-    return messages
+# === LOGIC ===
+def show_game_events():
+    # Hand the engine's log lines and repainted tiles over to the UI
+    for message in game.pop_messages():
+        message_log.add_message(message)
+    for q, r in game.pop_changed_tiles():
+        terrain_layer.invalidate_tile(q, r)
+
+def start_enemy_turn():
+    # The worker process plays the enemy on a snapshot; play_ai_turn() shows its moves as they arrive
+    global ai_turn
+    game.end_turn(play_ai=False)
+    try:
+        ai_turn = AiTurn(game)
+    except OSError as e:
+        # Play a short search right here instead, so the window only stalls briefly
+        message_log.add_message(f"Could not start the enemy AI process ({e})")
+        budget, game.ai.turn_budget_ms = game.ai.turn_budget_ms, MAIN_THREAD_TURN_BUDGET_MS
+        game.ai_turn()
+        game.ai.turn_budget_ms = budget
+
+def stop_enemy_turn():
+    global ai_turn, ai_animation
+    if ai_turn:
+        ai_turn.cancel()
+        ai_turn = None
+    ai_animation = None
+
+def play_ai_turn():
+    # Apply the enemy's streamed actions one at a time, leaving each on screen
+    # for AI_ACTION_MS; the ones that only ready a unit show nothing and go straight through
+    global ai_turn, ai_animation
+    if ai_animation and pygame.time.get_ticks() - ai_animation[1] < AI_ACTION_MS:
+        return
+    ai_animation = None
+    if not ai_turn:
+        return
+    while True:
+        action = ai_turn.step()
+        if action is None:
+            break
+        if action[0] != "ready":
+            ai_animation = (action, pygame.time.get_ticks())
+            return
+    if ai_turn.finished:
+        ai_turn = None
 
-def throw_grenade(unit, target_tile):
-    if unit.grenades <= 0 or unit.agility_points < 2:
-        return False
-    
-    # Check if target is within range
-    dist = max(abs(target_tile.q - unit.q), abs(target_tile.r - unit.r), 
-              abs((-unit.q - unit.r) - (-target_tile.q - target_tile.r)))
-    if dist > 1:
-        return False
-    
-    # Deal damage to all units in adjacent tiles
-    units_hit = []
-    for nq, nr in get_neighbors(target_tile.q, target_tile.r):
-        if (nq, nr) in tile_map:
-            adjacent_tile = tile_map[(nq, nr)]
-            if adjacent_tile.unit:
-                damage = unit.base_damage * 1.5  # Grenades deal 50% more damage
-                initial_health = adjacent_tile.unit.health
-                initial_soldiers = adjacent_tile.unit.soldiers if hasattr(adjacent_tile.unit, 'soldiers') else None
-                adjacent_tile.unit.health -= int(damage)
-                units_hit.append((adjacent_tile.unit, initial_health, initial_soldiers))
-                
-                # Calculate soldiers lost (even if unit is eliminated)
-                soldiers_lost = 0
-                if initial_soldiers is not None:
-                    soldiers_lost = initial_soldiers - (adjacent_tile.unit.soldiers if adjacent_tile.unit else 0) # Check if unit still exists for soldier count
-
-                # Create detailed damage message
-                damage_message = f"{unit.name} throws a grenade! {adjacent_tile.unit.name if adjacent_tile.unit else 'Target'} takes {int(damage)} damage"
-                if soldiers_lost > 0:
-                    damage_message += f" and loses {soldiers_lost} soldiers"
-                message_log.add_message(damage_message)
-
-                if adjacent_tile.unit and adjacent_tile.unit.health <= 0:
-                    message_log.add_message(f"{adjacent_tile.unit.name} has been eliminated!")
-                    adjacent_tile.unit = None
-                elif adjacent_tile.unit:
-                    # Reduce morale of surviving units
-                    morale_loss = random.randint(5, 15)
-                    adjacent_tile.unit.morale = max(0, adjacent_tile.unit.morale - morale_loss)
-                    message_log.add_message(f"{adjacent_tile.unit.name}'s morale drops by {morale_loss}%! (Current Morale: {adjacent_tile.unit.morale}%)")
-
-    unit.grenades -= 1
-    unit.agility_points -= 2
-    return True
-
-def throw_smoke(unit, target_tile):
-    if unit.smoke_grenades <= 0 or unit.agility_points < 2:
-        return False
-    
-    # Check if target is within range
-    dist = max(abs(target_tile.q - unit.q), abs(target_tile.r - unit.r), 
-              abs((-unit.q - unit.r) - (-target_tile.q - target_tile.r)))
-    if dist > 1:
-        return False
-    
-    # Apply smoke effect to target tile and adjacent tiles
-    affected_tiles = []
-    for nq, nr in get_neighbors(target_tile.q, target_tile.r):
-        if (nq, nr) in tile_map:
-            adjacent_tile = tile_map[(nq, nr)]
-            adjacent_tile.smoke = True
-            adjacent_tile.smoke_turns = 2  # Smoke lasts for 2 turns
-            affected_tiles.append(adjacent_tile)
-            if adjacent_tile.unit:
-                adjacent_tile.unit.smoke_affected = True
-    
-    # Also apply to target tile
-    target_tile.smoke = True
-    target_tile.smoke_turns = 2
-    affected_tiles.append(target_tile)
-    if target_tile.unit:
-        target_tile.unit.smoke_affected = True
-    
-    # Create message about affected units
-    affected_units = [tile.unit.name for tile in affected_tiles if tile.unit]
-    if affected_units:
-        message_log.add_message(f"{unit.name} throws a smoke grenade! The smoke screen conceals {', '.join(affected_units)}!")
-    else:
-        message_log.add_message(f"{unit.name} throws a smoke grenade, creating a smoke screen!")
-    
-    unit.smoke_grenades -= 1
-    unit.agility_points -= 2
-    return True
+def drop_lost_selection():
+    # A selected unit that was destroyed or surrendered can no longer be ordered about
+    global selected_unit, action_menu_active, waiting_for_target, current_action
+    if selected_unit and not game.on_map(selected_unit):
+        selected_unit = None
+        action_menu_active = False
+        waiting_for_target = False
+        current_action = None
 
-# === LOGIC ===
-def handle_tile_click(pos, tile_rects):
+def handle_tile_click(pos):
     global selected_unit, action_menu_active, waiting_for_target, current_action
     
-    if waiting_for_target:
-        for (q, r), rect in tile_rects.items():
-            if rect.collidepoint(pos):
-                target_tile = tile_map[(q, r)]
-                if current_action == "grenade":
-                    if selected_unit.throw_grenade(target_tile):
-                        waiting_for_target = False
-                        current_action = None
-                    else:
-                        message_log.add_message(f"{selected_unit.name} cannot throw a grenade there!")
-                elif current_action == "smoke":
-                    if throw_smoke(selected_unit, target_tile):
-                        message_log.add_message(f"{selected_unit.name} throws a smoke grenade!")
-                        waiting_for_target = False
-                        current_action = None
-                elif current_action in ["he_round", "aphe_round"] and target_tile.unit:
-                    if isinstance(selected_unit, TankUnit):
-                        ammo_type = "HE" if current_action == "he_round" else "APHE"
-                        if (current_action == "he_round" and selected_unit.he_rounds > 0) or \
-                           (current_action == "aphe_round" and selected_unit.aphe_rounds > 0):
-                            selected_unit.agility_points -= 2
-                            if current_action == "he_round":
-                                selected_unit.he_rounds -= 1
-                            else:
-                                selected_unit.aphe_rounds -= 1
-                            
-                            damage = calculate_damage(selected_unit, target_tile.unit, target_tile, ammo_type)
-                            combat_messages = get_combat_message(selected_unit, target_tile.unit, damage, 1, ammo_type)
-                            for msg in combat_messages:
-                                message_log.add_message(msg)
-                            
-                            if damage > 0:
-                                if target_tile.unit.take_damage(damage):
-                                    message_log.add_message(f"{target_tile.unit.name} has been destroyed!")
-                                    target_tile.unit = None
-                                elif target_tile.unit.surrendered:
-                                    message_log.add_message(f"{target_tile.unit.name} surrenders!")
-                                    target_tile.unit = None
-                            waiting_for_target = False
-                            current_action = None
-                return
+    coord = pick_tile(pos)
+    
+    if waiting_for_target and coord is not None:
+        q, r = coord
+        if current_action == "grenade":
+            if game.throw_grenade(selected_unit, q, r):
+                waiting_for_target = False
+                current_action = None
+        elif current_action == "smoke":
+            if game.throw_smoke(selected_unit, q, r):
+                game.log(f"{selected_unit.name} throws a smoke grenade!")
+                waiting_for_target = False
+                current_action = None
+        elif current_action in ["he_round", "aphe_round"]:
+            ammo_type = "HE" if current_action == "he_round" else "APHE"
+            if game.fire(selected_unit, q, r, ammo_type):
+                waiting_for_target = False
+                current_action = None
+        return
     
     if action_menu_active:
         if handle_menu_click(pos):
             return
     
-    for (q, r), rect in tile_rects.items():
-        if rect.collidepoint(pos):
-            tile = tile_map[(q, r)]
-            
-            if selected_unit:
-                dist = max(abs(q - selected_unit.q), abs(r - selected_unit.r), 
-                          abs((-selected_unit.q - selected_unit.r) - (-q - r)))
-                
-                # Check if movement is valid
-                can_move = True
-                if tile.terrain_type == "River":
-                    can_move = False
-                    message_log.add_message("Cannot move into river!")
-                elif dist > 1:
-                    can_move = False
-                    message_log.add_message("Cannot move that far!")
-                elif selected_unit.agility_points < 1:
-                    can_move = False
-                    message_log.add_message("Not enough action points!")
-                
-                if can_move and tile.unit is None and dist <= 1 and selected_unit.agility_points >= 1:
-                    # Move unit (1 AP = 1 hex movement)
-                    tile_map[(selected_unit.q, selected_unit.r)].unit = None
-                    selected_unit.q, selected_unit.r = q, r
-                    selected_unit.agility_points -= 1
-                    tile.unit = selected_unit
-                    return
-                elif tile.unit and tile.unit != selected_unit and tile.unit.is_enemy != selected_unit.is_enemy:
-                    # Attack (range is for shooting only)
-                    if dist <= selected_unit.range and selected_unit.agility_points >= 2:
-                        selected_unit.agility_points -= 2
-                        
-                        damage = calculate_damage(selected_unit, tile.unit, tile, distance=dist)
-                        combat_messages = get_combat_message(selected_unit, tile.unit, damage, dist)
-                        for msg in combat_messages:
-                            message_log.add_message(msg)
-                        
-                        if damage > 0:
-                            if tile.unit.take_damage(damage):
-                                message_log.add_message(f"{tile.unit.name} has been destroyed!")
-                                tile.unit = None
-                            elif tile.unit.surrendered:
-                                message_log.add_message(f"{tile.unit.name} surrenders!")
-                                tile.unit = None
-                        return
-            
-            if tile.unit and not tile.unit.is_enemy:
-                selected_unit = tile.unit
-                return
-
-# === MORALE SYSTEM ===
-def update_morale(unit, tile_map):
-    if unit.health <= 0 or unit.surrendered:
+    if coord is None:
         return
-        
-    # Check for nearby friendly units
-    nearby_friends = 0
-    for nq, nr in get_neighbors(unit.q, unit.r):
-        if (nq, nr) in tile_map:
-            neighbor_unit = tile_map[(nq, nr)].unit
-            if neighbor_unit and not neighbor_unit.is_enemy and neighbor_unit != unit:
-                nearby_friends += 1
+    q, r = coord
+    tile = game.tile_map[coord]
     
-    # Morale boost from nearby friends (up to +5 per turn)
-    if nearby_friends > 0:
-        morale_boost = min(5, nearby_friends)
-        unit.morale = min(100, unit.morale + morale_boost)
-        if morale_boost > 0:
-            message_log.add_message(f"{unit.name} gains {morale_boost} morale from nearby friendly units!")
-
-def ai_turn():
-    for enemy in enemy_units:
-        if enemy.health <= 0 or enemy.surrendered:
-            continue
-        enemy.agility_points = enemy.base_agility
-        update_morale(enemy, tile_map)  # Update enemy morale
-        while enemy.agility_points >= 2:
-            # Attack player units in range
-            attacked = False
-            for (q, r), tile in tile_map.items():
-                if tile.unit and not tile.unit.is_enemy:
-                    dist = max(abs(q - enemy.q), abs(r - enemy.r), 
-                             abs((-enemy.q - enemy.r) - (-q - r)))
-                    if dist <= enemy.range:
-                        # Deduct AP before calculating damage
-                        enemy.agility_points -= 2
-                        
-                        damage = calculate_damage(enemy, tile.unit, tile)
-                        combat_messages = get_combat_message(enemy, tile.unit, damage, dist)
-                        for msg in combat_messages:
-                            message_log.add_message(msg)
-                        
-                        if damage > 0:
-                            if tile.unit.take_damage(damage):
-                                message_log.add_message(f"{tile.unit.name} has been destroyed!")
-                                tile.unit = None
-                            elif tile.unit.surrendered:
-                                message_log.add_message(f"{tile.unit.name} surrenders!")
-                                tile.unit = None
-                        attacked = True
-                        break
-            if attacked:
-                continue
-
-            # Move closer to player units
-            moved = False
-            for nq, nr in get_neighbors(enemy.q, enemy.r):
-                if (nq, nr) in tile_map and tile_map[(nq, nr)].unit is None:
-                    tile_map[(enemy.q, enemy.r)].unit = None
-                    enemy.q, enemy.r = nq, nr
-                    tile_map[(nq, nr)].unit = enemy
-                    enemy.agility_points -= 1
-                    moved = True
-                    break
-            if not moved:
-                break
+    if selected_unit:
+        if tile.unit is None:
+            game.move(selected_unit, q, r)
+            return
+        elif tile.unit.is_enemy != selected_unit.is_enemy:
+            # Attack (range is for shooting only)
+            game.attack(selected_unit, q, r)
+            return
+    
+    if tile.unit and not tile.unit.is_enemy:
+        selected_unit = tile.unit
+        return
 
 # === MENU FUNCTIONS ===
+def draw_menu_background():
+    # Draw background
+    if video_bg and video_bg.cap is not None:
+        screen.blit(video_bg.get_frame(), (0, 0))
+    else:
+        screen.blit(background, (0, 0))
+    
+    # Draw menu overlay
+    screen.blit(assets.overlay((screen_width, screen_height), (0, 0, 0, 120)), (0, 0))
+
 def draw_button(rect, text, is_hovered=False, font_size=None):
     """Draw a button with hover effect and centered text"""
     # Use default font if no specific size provided
-    button_font = pygame.font.SysFont(None, font_size) if font_size else font
+    button_font = assets.font(font_size) if font_size else font
     
     # Draw button with hover effect
     box_color = (80, 80, 100) if is_hovered else (60, 60, 80)
@@ -1163,16 +1370,7 @@ def draw_button(rect, text, is_hovered=False, font_size=None):
     return rect
 
 def draw_menu():
-    # Draw background
-    if video_bg and video_bg.cap is not None:
-        screen.blit(video_bg.get_frame(), (0, 0))
-    else:
-        screen.blit(background, (0, 0))
-    
-    # Draw menu overlay
-    overlay = pygame.Surface((screen_width, screen_height), pygame.SRCALPHA)
-    overlay.fill((0,0,0,120))
-    screen.blit(overlay, (0,0))
+    draw_menu_background()
     
     # Draw title
     title = font.render("Operation Case Blue", True, (255,255,255))
@@ -1187,16 +1385,7 @@ def draw_menu():
         draw_button(pygame.Rect(rect), text, is_hovered)
 
 def draw_campaign_select():
-    # Draw background
-    if video_bg and video_bg.cap is not None:
-        screen.blit(video_bg.get_frame(), (0, 0))
-    else:
-        screen.blit(background, (0, 0))
-    
-    # Draw menu overlay
-    overlay = pygame.Surface((screen_width, screen_height), pygame.SRCALPHA)
-    overlay.fill((0,0,0,120))
-    screen.blit(overlay, (0,0))
+    draw_menu_background()
     
     # Draw back to main menu button
     mouse_pos = pygame.mouse.get_pos()
@@ -1216,23 +1405,20 @@ def draw_campaign_select():
         pygame.draw.rect(screen, box_color, rect)
         pygame.draw.rect(screen, (255, 255, 255), rect, 2)
         
-        # Load and draw campaign image
-        try:
-            img = pygame.image.load(campaign["image"])
-            img = pygame.transform.scale(img, (280, 200))  # Slightly smaller than box
+        # Draw campaign image
+        img = assets.image(campaign["image"], CAMPAIGN_IMAGE_SIZE)
+        if img:
             img_rect = img.get_rect(center=(rect.centerx, rect.centery - 50))
             screen.blit(img, img_rect)
-        except Exception as e:
-            print(f"Warning: Could not load campaign image {campaign['image']}: {e}")
         
         # Draw campaign name
-        name_font = pygame.font.SysFont(None, 36)
+        name_font = assets.font(36)
         name_text = name_font.render(campaign["name"], True, (255, 255, 255))
         name_rect = name_text.get_rect(center=(rect.centerx, rect.bottom - 80))
         screen.blit(name_text, name_rect)
         
         # Draw campaign subtitle
-        subtitle_font = pygame.font.SysFont(None, 24)
+        subtitle_font = assets.font(24)
         subtitle_text = subtitle_font.render(campaign["subtitle"], True, (200, 200, 200))
         subtitle_rect = subtitle_text.get_rect(center=(rect.centerx, rect.bottom - 50))
         screen.blit(subtitle_text, subtitle_rect)
@@ -1242,16 +1428,7 @@ def draw_campaign_select():
     draw_button(back_rect, "Back", back_rect.collidepoint(mouse_pos))
 
 def draw_mission_select():
-    # Draw background
-    if video_bg and video_bg.cap is not None:
-        screen.blit(video_bg.get_frame(), (0, 0))
-    else:
-        screen.blit(background, (0, 0))
-    
-    # Draw menu overlay
-    overlay = pygame.Surface((screen_width, screen_height), pygame.SRCALPHA)
-    overlay.fill((0,0,0,120))
-    screen.blit(overlay, (0,0))
+    draw_menu_background()
     
     # Get mouse position for hover detection
     mouse_pos = pygame.mouse.get_pos()
@@ -1301,9 +1478,9 @@ def draw_mission_select():
         pygame.draw.rect(info_surface, (255, 255, 255), (0, 0, info_width, info_height), 2)
         
         # Draw mission info
-        title_font = pygame.font.SysFont(None, 32)
-        date_font = pygame.font.SysFont(None, 24)
-        desc_font = pygame.font.SysFont(None, 20)
+        title_font = assets.font(32)
+        date_font = assets.font(24)
+        desc_font = assets.font(20)
         
         # Draw title
         title_text = title_font.render(mission["name"], True, (255, 255, 255))
@@ -1335,16 +1512,7 @@ def draw_mission_select():
         screen.blit(info_surface, (info_x, info_y))
 
 def draw_settings():
-    # Draw background
-    if video_bg and video_bg.cap is not None:
-        screen.blit(video_bg.get_frame(), (0, 0))
-    else:
-        screen.blit(background, (0, 0))
-    
-    # Draw menu overlay
-    overlay = pygame.Surface((screen_width, screen_height), pygame.SRCALPHA)
-    overlay.fill((0,0,0,120))
-    screen.blit(overlay, (0,0))
+    draw_menu_background()
     
     # Get mouse position for hover detection
     mouse_pos = pygame.mouse.get_pos()
@@ -1368,142 +1536,18 @@ def draw_settings():
 
 # --- Mission setup logic ---
 def setup_mission(mission_id):
-    global tile_map, units, enemy_units, player_unit, tank_unit, selected_unit, action_menu_active, action_menu_pos, waiting_for_target, current_action, camera_offset_x, camera_offset_y, hex_size
+    global game, selected_unit, action_menu_active, action_menu_pos, waiting_for_target, current_action, camera_offset_x, camera_offset_y, hex_size
     
     # Stop the video and music
     if video_bg:
         video_bg.stop()
     
-    # Reset all state
+    stop_enemy_turn()
     hex_size = base_hex_size
-    tile_map = {}
-    units = []
-    enemy_units = []
-    
-    # Get mission data
-    mission = MISSIONS[mission_id]
-    
-    # Create map with fixed layouts based on mission
-    if mission_id == 0:  # City-based mission with river
-        # Create a city layout with a river and bridges
-        for q in range(-MAP_RADIUS, MAP_RADIUS + 1):
-            for r in range(-MAP_RADIUS, MAP_RADIUS + 1):
-                if -q - r >= -MAP_RADIUS and -q - r <= MAP_RADIUS:
-                    # Create a river (horizontal line)
-                    if r == 0:
-                        terrain = "River"
-                    # Create bridges across the river
-                    elif r == 0 and (q == -2 or q == 2):
-                        terrain = "Bridge"
-                    # Create a city center
-                    elif abs(q) <= 2 and abs(r) <= 2 and r != 0:
-                        terrain = "House"
-                    # Create some roads
-                    elif q == 0 or r == 0 or q == r or q == -r:
-                        terrain = "Road"
-                    # Rest is plains
-                    else:
-                        terrain = "Plains"
-                    tile_map[(q, r)] = Tile(q, r, terrain)
-    
-    elif mission_id == 1:  # Hill-based mission
-        # Create a hill-based layout with some plains
-        for q in range(-MAP_RADIUS, MAP_RADIUS + 1):
-            for r in range(-MAP_RADIUS, MAP_RADIUS + 1):
-                if -q - r >= -MAP_RADIUS and -q - r <= MAP_RADIUS:
-                    # Create a central hill formation
-                    if abs(q) <= 3 and abs(r) <= 3:
-                        terrain = "Hill"
-                    # Create some forest patches
-                    elif (abs(q) == 4 and abs(r) <= 2) or (abs(r) == 4 and abs(q) <= 2):
-                        terrain = "Forest"
-                    # Rest is plains
-                    else:
-                        terrain = "Plains"
-                    tile_map[(q, r)] = Tile(q, r, terrain)
-    
-    else:  # Forest-based Russian mission
-        # Create a dense forest layout with some clearings
-        for q in range(-MAP_RADIUS, MAP_RADIUS + 1):
-            for r in range(-MAP_RADIUS, MAP_RADIUS + 1):
-                if -q - r >= -MAP_RADIUS and -q - r <= MAP_RADIUS:
-                    # Create some clearings
-                    if abs(q) <= 1 and abs(r) <= 1:
-                        terrain = "Plains"
-                    # Create some hills
-                    elif (abs(q) == 3 and abs(r) <= 2) or (abs(r) == 3 and abs(q) <= 2):
-                        terrain = "Hill"
-                    # Rest is forest
-                    else:
-                        terrain = "Forest"
-                    tile_map[(q, r)] = Tile(q, r, terrain)
-    
-    # Place player units
-    if mission.get("is_russian", False):
-        # Russian units (using basic circle for sprites)
-        player_unit = InfantryUnit("Russian Infantry", 100, 20, 70, 5, 10, "rus_infantry", range_=1, is_enemy=False)
-        player_unit.q, player_unit.r = mission["player_pos"]
-        player_unit.set_tile_map(tile_map)
-        tile_map[mission["player_pos"]].unit = player_unit
-        assign_unit_image(player_unit)  # Assign random appropriate image
-        units.append(player_unit)
-        
-        tank_unit = TankUnit("Russian Tank", 200, 40, 80, 3, 5, "rus_tank", range_=2, armor=50, armor_penetration=30, is_enemy=False)
-        tank_unit.q, tank_unit.r = mission["tank_pos"]
-        tank_unit.set_tile_map(tile_map)
-        tile_map[mission["tank_pos"]].unit = tank_unit
-        assign_unit_image(tank_unit)  # Assign random appropriate image
-        units.append(tank_unit)
-        
-        # Add additional Russian units
-        for unit_data in mission["additional_units"]:
-            if unit_data["type"] == "infantry":
-                unit = InfantryUnit("Russian Infantry", 100, 20, 70, 5, 10, "rus_infantry", range_=1, is_enemy=False)
-            else:  # tank
-                unit = TankUnit("Russian Tank", 200, 40, 80, 3, 5, "rus_tank", range_=2, armor=50, armor_penetration=30, is_enemy=False)
-            unit.q, unit.r = unit_data["pos"]
-            unit.set_tile_map(tile_map)
-            tile_map[unit_data["pos"]].unit = unit
-            assign_unit_image(unit)  # Assign random appropriate image
-            units.append(unit)
-        
-        # Place German enemy units (using German sprites)
-        for unit_data in mission["enemy_units"]:
-            if unit_data["type"] == "infantry":
-                unit = InfantryUnit("German Infantry", 100, 20, 60, 4, 10, "ger_infantry", range_=1, is_enemy=True)
-            else:  # tank
-                unit = TankUnit("German Tank", 200, 40, 80, 3, 5, "ger_tank", range_=2, armor=50, armor_penetration=30, is_enemy=True)
-            unit.q, unit.r = unit_data["pos"]
-            unit.set_tile_map(tile_map)
-            tile_map[unit_data["pos"]].unit = unit
-            assign_unit_image(unit)  # Assign random appropriate image
-            enemy_units.append(unit)
-    else:
-        # German units (original missions)
-        player_unit = InfantryUnit("German Infantry", 100, 20, 70, 5, 10, "ger_infantry", range_=1, is_enemy=False)
-        player_unit.q, player_unit.r = mission["player_pos"]
-        player_unit.set_tile_map(tile_map)
-        tile_map[mission["player_pos"]].unit = player_unit
-        assign_unit_image(player_unit)  # Assign random appropriate image
-        units.append(player_unit)
-        
-        tank_unit = TankUnit("German Tank", 200, 40, 80, 3, 5, "ger_tank", range_=2, armor=50, armor_penetration=30, is_enemy=False)
-        tank_unit.q, tank_unit.r = mission["tank_pos"]
-        tank_unit.set_tile_map(tile_map)
-        tile_map[mission["tank_pos"]].unit = tank_unit
-        assign_unit_image(tank_unit)  # Assign random appropriate image
-        units.append(tank_unit)
-        
-        # Place enemy unit (Russian)
-        enemy_unit = InfantryUnit("Russian Infantry", 100, 20, 60, 4, 10, "rus_infantry", range_=1, is_enemy=True)
-        for (q, r), tile in tile_map.items():
-            if tile.unit is None and abs(q) + abs(r) > 8:
-                tile.unit = enemy_unit
-                enemy_unit.q, enemy_unit.r = q, r
-                enemy_unit.set_tile_map(tile_map)
-                assign_unit_image(enemy_unit)  # Assign random appropriate image
-                enemy_units.append(enemy_unit)
-                break
+    game = GameState.from_mission(mission_id)
+    game.ai = SearchAI(turn_budget_ms=ENEMY_TURN_BUDGET_MS)
+    for unit in game.units + game.enemy_units:
+        assign_unit_image(unit)  # Assign random appropriate image
     
     # Reset game state
     selected_unit = None
@@ -1526,7 +1570,6 @@ def toggle_fullscreen():
 
 # === MAIN LOOP ===
 running = True
-turn_player = True
 menu_state = MENU_STATE_MAIN
 selected_mission = 0
 selected_campaign = None
@@ -1618,12 +1661,16 @@ while running:
                         elif text == "Back":
                             menu_state = MENU_STATE_MAIN
     elif menu_state == MENU_STATE_GAME:
-        screen.fill((10, 10, 20))
-        tile_rects = draw_map()
+        play_ai_turn()
+        show_game_events()
+        drop_lost_selection()
+        screen.fill(MAP_BACKGROUND)
+        draw_map()
         draw_bottom_panel()  # Always draw the bottom panel
         if selected_unit:
             draw_unit_info(selected_unit)
         draw_action_menu()
+        draw_shot_tooltip()
         end_turn_btn = draw_end_turn_button()
         back_btn = draw_back_to_main_button()
         pygame.display.flip()
@@ -1634,6 +1681,7 @@ while running:
                 if event.button == 1:  # Left click
                     if back_btn.collidepoint(event.pos):
                         menu_state = MENU_STATE_MAIN
+                        stop_enemy_turn()
                         # Reset game state
                         selected_unit = None
                         action_menu_active = False
@@ -1645,43 +1693,31 @@ while running:
                             video_bg.restart()
                         continue
                     elif end_turn_btn.collidepoint(event.pos):
-                        turn_player = not turn_player
-                        if turn_player:
-                            for unit in units:
-                                unit.agility_points = unit.base_agility
-                                unit.accuracy = unit.base_accuracy
-                                unit.smoke_affected = False
-                            # Update smoke duration
-                            for tile in tile_map.values():
-                                if tile.smoke:
-                                    tile.smoke_turns -= 1
-                                    if tile.smoke_turns <= 0:
-                                        tile.smoke = False
-                                        # Remove smoke_affected status from any unit in this tile
-                                        if tile.unit:
-                                            tile.unit.smoke_affected = False
+                        if ai_turn:
+                            stop_enemy_turn()
+                            message_log.add_message("Enemy turn stopped.")
+                        elif game.turn_player:
+                            start_enemy_turn()
                         else:
-                            ai_turn()
-                    elif turn_player:
+                            game.end_turn()
+                    elif game.turn_player:
                         if action_menu_active:
                             if handle_menu_click(event.pos):
                                 continue
                             action_menu_active = False
-                        handle_tile_click(event.pos, tile_rects)
+                        handle_tile_click(event.pos)
                     # Start dragging for map
                     dragging = True
                     drag_start_pos = event.pos
                     camera_start_offset = (camera_offset_x, camera_offset_y)
                 elif event.button == 3:  # Right click
-                    if turn_player:
-                        for (q, r), rect in tile_rects.items():
-                            if rect.collidepoint(event.pos):
-                                tile = tile_map[(q, r)]
-                                if tile.unit and not tile.unit.is_enemy:
-                                    selected_unit = tile.unit
-                                    action_menu_active = True
-                                    action_menu_pos = event.pos
-                                    break
+                    if game.turn_player:
+                        coord = pick_tile(event.pos)
+                        tile = game.tile_map[coord] if coord else None
+                        if tile and tile.unit and not tile.unit.is_enemy:
+                            selected_unit = tile.unit
+                            action_menu_active = True
+                            action_menu_pos = event.pos
                         else:
                             # If clicked outside a unit, close the menu
                             action_menu_active = False
@@ -1716,4 +1752,7 @@ while running:
                     camera_offset_y = camera_start_offset[1] + dy
         clock.tick(60)
 
+stop_enemy_turn()
+if video_bg:
+    video_bg.stop()
 pygame.quit()
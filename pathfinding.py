@@ -0,0 +1,374 @@
+"""A* routes over the hex map priced by Tile.movement_cost, with a cache of solved routes."""
+import heapq
+import math
+from operator import sub
+from collections import OrderedDict
+
+import numpy as np
+
+from hexgrid import hex_distance, hex_distances, neighbors
+
+IMPASSABLE_COST = 999  # River tiles carry this movement cost
+PATH_CACHE_MAX_ENTRIES = 4096
+REACH_CACHE_MAX_ENTRIES = 64  # Move ranges kept between occupancy changes
+LANDMARK_COUNT = 6  # Landmarks for the A* heuristic on big maps
+LANDMARK_MIN_TILES = 1000  # Smaller maps search fast enough on hex distance alone
+UNREACHABLE = 1e9  # Stands in for infinity in landmark tables so differences stay finite
+PATH_SEARCH_MAX_EXPANSIONS = 5000  # Uncapped searches give up after this many tiles (radius-50 queries need under 2000)
+PATH_CACHE_BUCKET_SIZE = 8  # Side in hexes of the buckets cached routes are filed under, by start and goal
+
+def passable(tile):
+    return tile.movement_cost < IMPASSABLE_COST
+
+def terrain_costs(graph, source):
+    # Dijkstra over the bare terrain: cost source -> tile
+    costs = {source: 0}
+    heap = [(0, source)]
+    heappop, heappush, inf = heapq.heappop, heapq.heappush, math.inf
+    while heap:
+        cost, current = heappop(heap)
+        if cost > costs[current]:
+            continue
+        for coord, tile in graph[current][0]:
+            new_cost = cost + tile.movement_cost
+            if new_cost < costs.get(coord, inf):
+                costs[coord] = new_cost
+                heappush(heap, (new_cost, coord))
+    return costs
+
+def bucket_distance(bucket, coord, size=PATH_CACHE_BUCKET_SIZE):
+    # Lower bound on the hex distance from coord to any tile of an axial bucket
+    q_low, r_low = bucket[0] * size, bucket[1] * size
+    dq = max(q_low - coord[0], 0, coord[0] - (q_low + size - 1))
+    dr = max(r_low - coord[1], 0, coord[1] - (r_low + size - 1))
+    return max(dq, dr)
+
+class PathFinder:
+    """Cheapest routes between tiles of one map.
+
+    Entering a tile costs its movement_cost. Rivers and tiles holding a unit
+    are impassable, except that with occupied_goal the route may end on an
+    occupied goal (a unit to close on). Solved routes, and the suffixes of
+    each route, are cached until the game reports a tile change that could
+    affect them:
+
+    - tile_blocked(coord) drops routes passing through coord.
+    - tile_freed(coord) drops routes that a detour through coord could
+      beat, judged by the A* lower bound, plus every cached "no route".
+      Routes are filed by the buckets of their start and goal, and a pair
+      of buckets whose routes are all too cheap for a detour through coord
+      to beat is skipped unread.
+    - terrain_changed(coord) drops everything.
+
+    Move ranges from reachable() are cached by (start, budget) and all
+    dropped on any of the three, each of which bumps `version`.
+
+    On big maps the A* heuristic uses landmarks (ALT), built with the
+    graph. The exact terrain-only costs to and from a few far-apart tiles
+    give, through the triangle inequality, a lower bound far tighter than
+    hex distance times the cheapest tile. Units only ever block tiles, so
+    the bound stays admissible. Uncapped searches stop after
+    PATH_SEARCH_MAX_EXPANSIONS tiles, so a goal walled in by units costs
+    a bounded amount to give up on.
+    """
+    def __init__(self, tile_map):
+        self.tile_map = tile_map
+        self.cache = OrderedDict()  # (start, goal, occupied_goal) -> (cost, route) or None
+        self.through = {}  # coord -> cache keys whose route enters that tile
+        self.by_bucket = {}  # (start bucket, goal bucket) -> {cache key: hexes a detour may span and still be cheaper}
+        self.bucket_reach = {}  # (start bucket, goal bucket) -> at least the largest of those spans
+        self.no_route = set()  # Cache keys holding None
+        self.reach_cache = OrderedDict()  # (start, max_cost) -> {coord: cost}
+        self.version = 0  # Bumped on every occupancy or terrain change
+        self.hits = 0
+        self.misses = 0
+        self.given_up = 0  # Uncapped searches stopped by PATH_SEARCH_MAX_EXPANSIONS
+        self.min_cost = 1
+        self.terrain_changed(None)
+
+    # --- Cache upkeep ---
+    def buckets(self, key):
+        (sq, sr), (gq, gr), _ = key
+        size = PATH_CACHE_BUCKET_SIZE
+        return (sq // size, sr // size), (gq // size, gr // size)
+
+    def forget(self, key):
+        if key not in self.cache:
+            return
+        result = self.cache.pop(key)
+        if result is None:
+            self.no_route.discard(key)
+            return
+        buckets = self.buckets(key)
+        entries = self.by_bucket[buckets]
+        del entries[key]
+        if not entries:
+            del self.by_bucket[buckets]
+            del self.bucket_reach[buckets]
+        for coord in result[1][1:]:
+            keys = self.through.get(coord)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.through[coord]
+
+    def remember(self, key, result):
+        if key in self.cache:
+            self.forget(key)
+        self.cache[key] = result
+        if result is None:
+            self.no_route.add(key)
+        else:
+            for coord in result[1][1:]:
+                self.through.setdefault(coord, set()).add(key)
+            buckets = self.buckets(key)
+            reach = result[0] / self.min_cost
+            self.by_bucket.setdefault(buckets, {})[key] = reach
+            self.bucket_reach[buckets] = max(reach, self.bucket_reach.get(buckets, 0))
+        while len(self.cache) > PATH_CACHE_MAX_ENTRIES:
+            self.forget(next(iter(self.cache)))
+
+    def occupancy_changed(self):
+        self.version += 1
+        self.reach_cache.clear()
+
+    def tile_blocked(self, coord):
+        self.occupancy_changed()
+        for key in list(self.through.get(coord, ())):
+            start, goal, occupied_goal = key
+            if not (occupied_goal and coord == goal):
+                self.forget(key)
+
+    def tile_freed(self, coord):
+        self.occupancy_changed()
+        for key in list(self.no_route):
+            self.forget(key)
+        q, r = coord
+        distances = {}  # Bucket -> lower bound on its hex distance to coord
+        for buckets, entries in list(self.by_bucket.items()):
+            bound = 0
+            for bucket in buckets:
+                distance = distances.get(bucket)
+                if distance is None:
+                    distance = distances[bucket] = bucket_distance(bucket, coord)
+                bound += distance
+            if bound >= self.bucket_reach[buckets]:
+                continue  # A detour through coord is too long for any of these routes
+            for key, reach in list(entries.items()):
+                (sq, sr), (gq, gr), _ = key
+                # A route through coord costs at least min_cost per hex
+                if hex_distance(sq, sr, q, r) + hex_distance(q, r, gq, gr) < reach:
+                    self.forget(key)
+
+    def terrain_changed(self, coord):
+        self.occupancy_changed()
+        self.cache.clear()
+        self.through.clear()
+        self.by_bucket.clear()
+        self.bucket_reach.clear()
+        self.no_route.clear()
+        costs = [tile.movement_cost for tile in self.tile_map.values() if passable(tile)]
+        self.min_cost = min(costs, default=1)
+        # coord -> (passable neighbours as (coord, tile), own movement cost)
+        self.graph = {}
+        for coord, tile in self.tile_map.items():
+            if passable(tile):
+                steps = tuple((n, self.tile_map[n]) for n in neighbors(*coord)
+                              if n in self.tile_map and passable(self.tile_map[n]))
+                self.graph[coord] = (steps, tile.movement_cost)
+        self.build_landmarks()
+
+    def build_landmarks(self):
+        self.landmarks = {}
+        if len(self.graph) < LANDMARK_MIN_TILES:
+            return
+        # Spread landmarks out: each is the tile farthest from those already chosen
+        coords = list(self.graph)
+        qs = np.array([q for q, r in coords])
+        rs = np.array([r for q, r in coords])
+        chosen = [coords[int(np.argmax(hex_distances(0, 0, qs, rs)))]]
+        nearest = hex_distances(chosen[0][0], chosen[0][1], qs, rs)
+        while len(chosen) < LANDMARK_COUNT:
+            i = int(np.argmax(nearest))
+            chosen.append(coords[i])
+            nearest = np.minimum(nearest, hex_distances(coords[i][0], coords[i][1], qs, rs))
+        # Entering a tile is what costs, so walking a route backwards costs
+        # the same minus the tile it now starts on plus the one it now ends
+        # on: the costs to a landmark follow from the costs from it
+        graph = self.graph
+        from_tables = [terrain_costs(graph, landmark) for landmark in chosen]
+        self.landmarks = {}
+        for coord in coords:
+            own = graph[coord][1]
+            costs_from = tuple(table.get(coord, UNREACHABLE) for table in from_tables)
+            costs_to = tuple(cost if cost == UNREACHABLE else cost - own + graph[landmark][1]
+                             for cost, landmark in zip(costs_from, chosen))
+            self.landmarks[coord] = (costs_from, costs_to)
+
+    def heuristic(self, coord, goal, goal_costs):
+        costs = self.landmarks.get(coord) if goal_costs else None
+        if costs is None:
+            return self.min_cost * hex_distance(coord[0], coord[1], goal[0], goal[1])
+        # cost(L, goal) <= cost(L, coord) + cost(coord, goal), and likewise
+        # cost(coord, L) <= cost(coord, goal) + cost(goal, L)
+        return max(0, max(map(sub, goal_costs[0], costs[0])), max(map(sub, costs[1], goal_costs[1])))
+
+    def steps(self, coord):
+        # Passable neighbours of coord as (coord, tile). Units may start on a
+        # tile they could not enter, like the river in mission 1, which the graph leaves out
+        entry = self.graph.get(coord)
+        if entry is not None:
+            return entry[0]
+        tile_map = self.tile_map
+        return tuple((n, tile_map[n]) for n in neighbors(*coord) if n in tile_map and passable(tile_map[n]))
+
+    # --- Queries ---
+    def find_path(self, start, goal, max_cost=None, occupied_goal=False):
+        """Return (cost, [start, ..., goal]) for the cheapest route, or None.
+
+        With max_cost the search gives up on anything dearer, which keeps
+        queries for far or unreachable tiles cheap. Without it the search
+        gives up after PATH_SEARCH_MAX_EXPANSIONS tiles, and that None is
+        not cached, since a later search may get further once units move.
+        """
+        key = (start, goal, occupied_goal)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            result = self.cache[key]
+            if result is not None and max_cost is not None and result[0] > max_cost:
+                return None
+            return result
+
+        self.misses += 1
+        given_up = self.given_up
+        result = self.search(start, goal, max_cost, occupied_goal)
+        if result is not None:
+            # Every tail of a cheapest route is itself a cheapest route
+            cost, route = result
+            spent = 0
+            for i in range(len(route) - 1):
+                self.remember((route[i], goal, occupied_goal), (cost - spent, route[i:]))
+                spent += self.tile_map[route[i + 1]].movement_cost
+            return result
+        if max_cost is None and self.given_up == given_up:
+            # A bounded miss may only mean "too far", so only unbounded misses are kept
+            self.remember(key, None)
+        return None
+
+    def search(self, start, goal, max_cost, occupied_goal):
+        tile_map = self.tile_map
+        goal_tile = tile_map.get(goal)
+        if goal_tile is None or start not in tile_map:
+            return None
+        if start == goal:
+            return 0, [start]
+        if not passable(goal_tile) or (goal_tile.unit is not None and not occupied_goal):
+            return None
+
+        graph = self.graph
+        if start not in graph:
+            graph = dict(graph)
+            graph[start] = (self.steps(start), 0)
+        goal_costs = self.landmarks.get(goal) if self.landmarks else None
+        heuristic = self.heuristic
+        estimates = {}  # Heuristic per tile, as tiles are often reached more than once
+        came_from = {start: None}
+        best = {start: 0}
+        heap = [(heuristic(start, goal, goal_costs), 0, 0, start)]
+        pushed = 0
+        expansions = PATH_SEARCH_MAX_EXPANSIONS if max_cost is None else math.inf
+        while heap and expansions > 0:
+            _, negative_cost, _, current = heapq.heappop(heap)
+            expansions -= 1
+            cost = -negative_cost
+            if current == goal:
+                route = [current]
+                while came_from[current] is not None:
+                    current = came_from[current]
+                    route.append(current)
+                route.reverse()
+                return cost, route
+            if cost > best[current]:
+                continue  # Stale heap entry
+            for coord, tile in graph[current][0]:
+                if tile.unit is not None and not (occupied_goal and coord == goal):
+                    continue
+                new_cost = cost + tile.movement_cost
+                if max_cost is not None and new_cost > max_cost:
+                    continue
+                if new_cost < best.get(coord, math.inf):
+                    best[coord] = new_cost
+                    came_from[coord] = current
+                    pushed += 1
+                    estimate = estimates.get(coord)
+                    if estimate is None:
+                        estimate = estimates[coord] = heuristic(coord, goal, goal_costs)
+                    estimate += new_cost
+                    heapq.heappush(heap, (estimate, -new_cost, pushed, coord))
+        if heap:
+            self.given_up += 1
+        return None
+
+    def reachable(self, start, max_cost):
+        """Return {coord: cost} for every tile a unit on start can walk to within max_cost.
+
+        Dijkstra over the same rules as find_path(), so a tile is in the
+        result exactly when find_path(start, coord, max_cost) finds a route,
+        and at the same cost. Results hold until the next occupancy change.
+        """
+        key = (start, max_cost)
+        costs = self.reach_cache.get(key)
+        if costs is not None:
+            self.reach_cache.move_to_end(key)
+            return costs
+
+        costs = {start: 0}
+        heap = [(0, start)]
+        while heap:
+            cost, current = heapq.heappop(heap)
+            if cost > costs[current]:
+                continue  # Stale heap entry
+            for coord, tile in self.steps(current):
+                if tile.unit is not None:
+                    continue
+                new_cost = cost + tile.movement_cost
+                if new_cost <= max_cost and new_cost < costs.get(coord, math.inf):
+                    costs[coord] = new_cost
+                    heapq.heappush(heap, (new_cost, coord))
+        del costs[start]
+
+        self.reach_cache[key] = costs
+        if len(self.reach_cache) > REACH_CACHE_MAX_ENTRIES:
+            self.reach_cache.popitem(last=False)
+        return costs
+
+    def flow_field(self, goals):
+        """Return {coord: cost} of the cheapest walk from each tile to the nearest of goals.
+
+        One reverse Dijkstra over the terrain, so any number of units can
+        close on the goals by stepping to a neighbour with a lower cost.
+        Goal tiles count as free to enter, since they are only closed on.
+        Units are left out: they move while a field is in use, so callers
+        step around them instead.
+        """
+        goals = {goal for goal in goals if goal in self.tile_map}
+        field = dict.fromkeys(goals, 0)
+        heap = [(0, goal) for goal in goals]
+        heapq.heapify(heap)
+        while heap:
+            cost, current = heapq.heappop(heap)
+            if cost > field[current]:
+                continue  # Stale heap entry
+            # Walking onto current from any of its neighbours costs the same
+            step = cost if current in goals else cost + self.tile_map[current].movement_cost
+            for coord, tile in self.steps(current):
+                if step < field.get(coord, math.inf):
+                    field[coord] = step
+                    heapq.heappush(heap, (step, coord))
+        return field
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return f"{len(self.cache)} routes cached, hit rate {rate:.1%}, {self.given_up} searches given up"
@@ -0,0 +1,208 @@
+"""Anytime Monte Carlo search for the enemy side, a drop-in for the greedy ai_turn() loop.
+
+    state.ai = SearchAI(seed=7)  # Plays every enemy turn from then on
+
+Each decision weighs plans of the form "move to a firing position (or
+stay) and shoot this target". A plan is scored by playouts that roll the
+shots through calculate_damage() and take_damage(), then let the player
+units in range fire back for a turn. Playouts run on shallow clones of
+the units involved, so the game state itself is never touched. UCB1
+spends the playouts on the plans that still look promising, and the
+search stops when its time or playout budget runs out.
+"""
+import math
+import random
+import time
+
+from combat import ENEMY_SHOT_DISTANCE, calculate_damage
+from hexgrid import hex_distance
+from zobrist import TranspositionTable
+
+SEARCH_UNIT_BUDGET_MS = 40  # Thinking time per decision of one unit
+SEARCH_TURN_BUDGET_MS = 1500  # Thinking time for the whole enemy turn
+SEARCH_MAX_SPOTS = 6  # Firing positions weighed per decision, least threatened first
+UCB_EXPLORATION = 0.7
+SEARCH_TABLE_ENTRIES = 4096  # Decisions remembered by state hash
+
+def clone_unit(unit):
+    # Every field a playout changes is a plain number, so a shallow copy is
+    # enough; the clone is cut loose from the battle's hash
+    clone = object.__new__(type(unit))
+    clone.__dict__.update(unit.__dict__)
+    clone.__dict__["zobrist"] = None
+    return clone
+
+def loss(unit, clone):
+    # Share of the unit's health lost in a playout, plus 1 if it was knocked out
+    lost = (unit.health - clone.health) / unit.base_health
+    if clone.health <= 0 or clone.surrendered:
+        lost += 1
+    return lost
+
+class SearchAI:
+    """Plays the enemy turn unit by unit, searching each decision under a budget.
+
+    unit_budget_ms bounds each decision and turn_budget_ms the whole turn,
+    shared among the units still to move; either may be None. With
+    max_playouts set, a decision also stops after that many playouts.
+    Playouts draw from a Random seeded by (seed, decision number), and
+    the game's own random stream is left alone. A fixed seed with a
+    playout budget and no time budget therefore replays exactly, which is
+    what balance.py uses for benchmarks.
+
+    Decisions are kept in a transposition table keyed by the state's
+    Zobrist hash and the unit to move, so a position met again, by
+    whatever order of moves, is searched only once. The entry records how
+    many playouts backed it, for the "depth" replacement policy.
+    """
+    def __init__(self, seed=0, unit_budget_ms=SEARCH_UNIT_BUDGET_MS, turn_budget_ms=SEARCH_TURN_BUDGET_MS,
+                 max_playouts=None, table_entries=SEARCH_TABLE_ENTRIES, replacement="depth"):
+        self.seed = seed
+        self.unit_budget_ms = unit_budget_ms
+        self.turn_budget_ms = turn_budget_ms
+        self.max_playouts = max_playouts
+        self.decisions = 0
+        self.playouts = 0
+        self.search_time = 0.0
+        self.table = TranspositionTable(table_entries, replacement)
+
+    # --- Turn ---
+    def play_turn(self, state):
+        turn_deadline = None
+        if self.turn_budget_ms is not None:
+            turn_deadline = time.perf_counter() + self.turn_budget_ms / 1000
+        enemies = [enemy for enemy in state.enemy_units if enemy.health > 0 and not enemy.surrendered]
+        for i, enemy in enumerate(enemies):
+            state.ai_ready(enemy)
+            while enemy.agility_points >= 2 and state.on_map(enemy) and state.index.factions[False]:
+                plan = self.choose(state, enemy, self.deadline(turn_deadline, len(enemies) - i))
+                if plan is None:
+                    # Nothing to shoot from anywhere in reach: close in instead
+                    if not state.flow_step(enemy, state.approach_field()):
+                        break
+                    continue
+                (q, r), cost, target = plan
+                if (q, r) != (enemy.q, enemy.r):
+                    state.ai_move(enemy, q, r, cost)
+                state.ai_shoot(enemy, target)
+
+    def deadline(self, turn_deadline, units_left):
+        now = time.perf_counter()
+        deadline = None
+        if self.unit_budget_ms is not None:
+            deadline = now + self.unit_budget_ms / 1000
+        if turn_deadline is not None:
+            share = now + max(0, turn_deadline - now) / units_left
+            deadline = share if deadline is None else min(deadline, share)
+        return deadline
+
+    # --- Plans ---
+    def plans(self, state, enemy):
+        """Every (coord, AP cost, target) worth weighing, staying put first."""
+        here = (enemy.q, enemy.r)
+        spots = [(here, 0)]
+        positions = state.firing_positions(enemy)
+        if positions:
+            threat = state.influence.threat[not enemy.is_enemy]
+            position = state.influence.position
+            ranked = sorted(positions, key=lambda coord: (threat[position[coord]], positions[coord], coord))
+            spots += [(coord, positions[coord]) for coord in ranked[:SEARCH_MAX_SPOTS]]
+        plans = []
+        for coord, cost in spots:
+            for target in state.actions.attack_targets(enemy, coord):
+                plans.append((coord, cost, target))
+        return plans
+
+    def choose(self, state, enemy, deadline):
+        plans = self.plans(state, enemy)
+        if len(plans) <= 1:
+            return plans[0] if plans else None
+
+        zobrist = state.zobrist
+        key = zobrist.hash ^ zobrist.key(enemy.zobrist_slot, "to_move", True)
+        known = self.table.get(key)
+        if known is not None:
+            coord, cost, target_slot = known
+            return coord, cost, zobrist.units[target_slot]
+
+        start = time.perf_counter()
+        rng = random.Random(f"{self.seed}:{self.decisions}")
+        self.decisions += 1
+        contexts = [self.context(state, enemy, plan) for plan in plans]
+        visits = [0] * len(plans)
+        totals = [0.0] * len(plans)
+        played = 0
+        while True:
+            if played < len(plans):
+                arm = played  # Every plan is tried once before UCB1 takes over
+            else:
+                if self.max_playouts is not None and played >= self.max_playouts:
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                if deadline is None and self.max_playouts is None:
+                    break
+                log_played = math.log(played)
+                arm = max(range(len(plans)), key=lambda i: totals[i] / visits[i] +
+                          UCB_EXPLORATION * math.sqrt(log_played / visits[i]))
+            totals[arm] += self.playout(state, enemy, plans[arm], contexts[arm], rng)
+            visits[arm] += 1
+            played += 1
+        self.playouts += played
+        self.search_time += time.perf_counter() - start
+        coord, cost, target = plans[max(range(len(plans)), key=lambda i: totals[i] / visits[i])]
+        self.table.put(key, (coord, cost, target.zobrist_slot), depth=played)
+        return coord, cost, target
+
+    def context(self, state, enemy, plan):
+        # What a playout of this plan needs, worked out once per decision
+        (q, r), cost, target = plan
+        shots = int((enemy.agility_points - cost) // 2)
+        others = [unit for unit in state.actions.attack_targets(enemy, (q, r)) if unit is not target]
+        # Player units already in range of the new position fire back next turn
+        longest = max(unit.range for unit in state.index.factions[False])
+        shooters = [(unit, hex_distance(unit.q, unit.r, q, r), unit.base_agility // 2)
+                    for unit in state.actions.attack_targets(enemy, (q, r), longest)
+                    if hex_distance(unit.q, unit.r, q, r) <= unit.range]
+        return shots, [target] + others, shooters
+
+    def playout(self, state, enemy, plan, context, rng):
+        """Roll one outcome of the plan and return damage dealt minus damage taken."""
+        (q, r), _, _ = plan
+        shots, targets, shooters = context
+        tile_map = state.tile_map
+        me = clone_unit(enemy)
+        me.q, me.r = q, r
+        clones = {unit: clone_unit(unit) for unit in targets}
+        for unit, _, _ in shooters:
+            clones.setdefault(unit, clone_unit(unit))
+
+        # Our shots, as ai_shoot() rolls them, moving on when a target drops
+        alive = list(targets)
+        for _ in range(shots):
+            if not alive:
+                break
+            target = clones[alive[0]]
+            damage = calculate_damage(me, target, tile_map[(target.q, target.r)],
+                                      distance=ENEMY_SHOT_DISTANCE, rng=rng)
+            if damage > 0 and (target.take_damage(damage, rng) or target.surrendered):
+                alive.pop(0)
+
+        # Their reply with the attack() rules, from units that survived
+        tile = tile_map[(q, r)]
+        for unit, distance, reply_shots in shooters:
+            shooter = clones[unit]
+            if shooter.health <= 0 or shooter.surrendered:
+                continue
+            for _ in range(reply_shots):
+                damage = calculate_damage(shooter, me, tile, distance=distance, rng=rng)
+                if damage > 0 and (me.take_damage(damage, rng) or me.surrendered):
+                    break
+            if me.health <= 0 or me.surrendered:
+                break
+        return sum(loss(unit, clone) for unit, clone in clones.items()) - loss(enemy, me)
+
+    def stats(self):
+        rate = self.playouts / self.search_time if self.search_time else 0.0
+        return (f"{self.decisions} decisions, {self.playouts} playouts, {rate:.0f} playouts/s, "
+                f"table: {self.table.stats()}")
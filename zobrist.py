@@ -0,0 +1,139 @@
+"""Incremental Zobrist hashing of a battle and a bounded transposition table keyed by it."""
+import hashlib
+from collections import OrderedDict
+
+# The HashedField attributes of Unit (and TankUnit) and Tile. Morale, accuracy and smoke
+# cover are in as well as positions, health, AP and ammo, since every shot reads them.
+UNIT_FIELDS = ("q", "r", "health", "soldiers", "agility_points", "morale", "accuracy", "surrendered",
+               "smoke_affected", "grenades", "smoke_grenades", "he_rounds", "aphe_rounds")
+TILE_FIELDS = ("smoke", "smoke_turns")
+TABLE_MAX_ENTRIES = 1 << 16
+REPLACEMENT_POLICIES = ("lru", "always", "depth")
+
+_feature_keys = {}
+
+def feature_key(feature):
+    # 64 random-looking bits per feature, the same in every process and run,
+    # so one cache serves every battle
+    key = _feature_keys.get(feature)
+    if key is None:
+        digest = hashlib.blake2b(repr(feature).encode(), digest_size=8).digest()
+        key = _feature_keys[feature] = int.from_bytes(digest, "little")
+    return key
+
+def canonical(value):
+    # AP goes fractional on roads; 3.0 and 3 must hash alike
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+class Zobrist:
+    """The XOR of one key per (slot, field, value) of every unit and tile, and the side to move.
+
+    Units are numbered in the order they join the battle and tiles by
+    coordinate. The HashedField descriptors in game_objects.py report
+    every write to the fields above, wherever it is made, and each costs
+    two XORs. Keys are made on first use and shared by every battle.
+    Empty values (0, False, None) key to 0, so smoke-free tiles add
+    nothing to the hash.
+    """
+    def __init__(self, tile_map):
+        self.units = []  # slot -> unit
+        self.hash = 0
+        for coord, tile in tile_map.items():
+            if tile.smoke or tile.smoke_turns:
+                for name in TILE_FIELDS:
+                    self.hash ^= self.key(coord, name, getattr(tile, name))
+            tile.zobrist = self
+
+    def key(self, slot, name, value):
+        if not value:
+            return 0
+        return feature_key((slot, name, canonical(value)))
+
+    def add_unit(self, unit):
+        slot = len(self.units)
+        self.units.append(unit)
+        fields = vars(unit)  # Not getattr: fields a unit kind lacks must read as None
+        for name in UNIT_FIELDS:
+            self.hash ^= self.key(slot, name, fields.get(name))
+        unit.zobrist_slot = slot
+        unit.zobrist = self
+
+    def changed(self, slot, name, old, new):
+        self.hash ^= self.key(slot, name, old) ^ self.key(slot, name, new)
+
+    def flip_side(self):
+        self.hash ^= self.key(None, "turn_player", True)
+
+    def recompute(self, state):
+        """The hash from scratch, to check the incremental one against."""
+        value = 0 if state.turn_player else self.key(None, "turn_player", True)
+        for coord, tile in state.tile_map.items():
+            for name in TILE_FIELDS:
+                value ^= self.key(coord, name, getattr(tile, name))
+        for slot, unit in enumerate(self.units):
+            fields = vars(unit)
+            for name in UNIT_FIELDS:
+                value ^= self.key(slot, name, fields.get(name))
+        return value
+
+class TranspositionTable:
+    """Results by state hash, bounded to max_entries.
+
+    replacement decides what a full table gives up for a new entry:
+    - "lru": the least recently used entry.
+    - "always": whatever shares the new entry's slot (hash modulo size).
+    - "depth": the same slot, but only if the incumbent was searched no
+      deeper than the newcomer; depth is whatever effort measure the
+      caller stores (plies, playouts).
+    """
+    def __init__(self, max_entries=TABLE_MAX_ENTRIES, replacement="depth"):
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError(f"Unknown replacement policy: {replacement}")
+        self.max_entries = max_entries
+        self.replacement = replacement
+        if replacement == "lru":
+            self.entries = OrderedDict()  # key -> (depth, value)
+        else:
+            self.slots = [None] * max_entries  # (key, depth, value) or None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if self.replacement == "lru":
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        else:
+            entry = self.slots[key % self.max_entries]
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[2]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, depth=0):
+        if self.replacement == "lru":
+            self.entries[key] = (depth, value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return
+        index = key % self.max_entries
+        entry = self.slots[index]
+        if self.replacement == "depth" and entry is not None and entry[0] != key and entry[1] > depth:
+            return
+        self.slots[index] = (key, depth, value)
+
+    def __len__(self):
+        if self.replacement == "lru":
+            return len(self.entries)
+        return sum(1 for entry in self.slots if entry is not None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return f"{len(self)} positions stored, hit rate {rate:.1%}"